@@ -9,6 +9,8 @@ import hashlib
 from datetime import datetime
 from typing import Optional, Dict
 
+from core.warmup import start_warmup as start_background_warmup
+
 # ============================================================================
 # CONFIGURATION
 # ============================================================================
@@ -780,6 +782,15 @@ def show_system_settings():
     with st.container():
         st.info("System settings will be implemented here")
 
+# ============================================================================
+# WARM-UP
+# ============================================================================
+
+@st.cache_resource
+def start_warmup():
+    """Preload the embedding model and the hottest vector stores once per server process"""
+    return start_background_warmup(background=True)
+
 # ============================================================================
 # MAIN APP
 # ============================================================================
@@ -790,6 +801,9 @@ def main():
     # Initialize database
     init_database()
     
+    # Preload the model and hot documents without blocking the first page load
+    start_warmup()
+    
     # Initialize session state
     if 'logged_in' not in st.session_state:
         st.session_state.logged_in = False
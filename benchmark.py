@@ -0,0 +1,1148 @@
+"""
+Performance benchmarks for the retrieval pipeline.
+
+Usage:
+    python benchmark.py load --chunks 50000
+    python benchmark.py ann --sizes 5000 20000 100000 500000
+    python benchmark.py compress --chunks 50000
+    python benchmark.py batch --batch-sizes 1 8 64 512
+    python benchmark.py startup
+    python benchmark.py backends --texts 512
+    python benchmark.py concurrent --sessions 1 4 16
+    python benchmark.py lexical --chunks 5000 50000
+    python benchmark.py reindex --pages 900 --changed 0.02
+    python benchmark.py metadata --chunks 50000
+    python benchmark.py contention --sessions 4
+    python benchmark.py pca --dims 384 192 128 64
+    python benchmark.py binary --sizes 100000 1000000 5000000
+    python benchmark.py parse --pages 300
+    python benchmark.py parallel --pages 1500 --workers 1 2 4
+    python benchmark.py ingest --pages 400 800
+
+Results are printed to stdout (redirect to bench_output.txt to keep them).
+"""
+import argparse
+import functools
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+
+def rss_mb() -> Dict[str, float]:
+    """Returns the current resident set size split into private and file-backed memory."""
+    usage = {"rss": 0.0, "anon": 0.0, "file": 0.0}
+    keys = {"VmRSS:": "rss", "RssAnon:": "anon", "RssFile:": "file"}
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                parts = line.split()
+                if parts and parts[0] in keys:
+                    usage[keys[parts[0]]] = int(parts[1]) / 1024
+    except FileNotFoundError:
+        import resource
+        usage["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return usage
+
+
+def synthetic_corpus(n: int, dim: int = 384, seed: int = 0, decay: float = 0.0) -> np.ndarray:
+    """
+    Clustered unit vectors that roughly mimic sentence embeddings.
+
+    decay > 0 shrinks dimension i by (i + 1) ** -decay, giving the decaying
+    variance spectrum of real embeddings that PCA exploits.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(1, n // 100), dim)).astype("float32")
+    labels = rng.integers(0, len(centers), n)
+    scale = (np.arange(dim, dtype="float32") + 1) ** -decay
+
+    # Filled in blocks so million-vector corpora need no float64 temporaries
+    vectors = np.empty((n, dim), dtype="float32")
+    for start in range(0, n, 65536):
+        block = vectors[start:start + 65536]
+        block[:] = centers[labels[start:start + len(block)]]
+        block += 0.5 * rng.standard_normal(block.shape, dtype="float32")
+        block *= scale
+        block /= np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+
+def synthetic_metadata(n: int) -> List[Dict[str, Any]]:
+    words = "pump valve pressure manual section clause error code part maintenance".split()
+    return [
+        {
+            "page": i // 5 + 1,
+            "text": " ".join(words[(i + j) % len(words)] for j in range(150)) + f" #{i}",
+            "has_images": i % 7 == 0
+        }
+        for i in range(n)
+    ]
+
+
+def print_table(title: str, rows: List[Dict[str, Any]]) -> None:
+    print(f"\n## {title}\n")
+    if not rows:
+        return
+    headers = list(rows[0].keys())
+    print(" | ".join(headers))
+    print(" | ".join("---" for _ in headers))
+    for row in rows:
+        print(" | ".join(f"{v:.3f}" if isinstance(v, float) else str(v) for v in row.values()))
+
+
+# ------------------------------------
+# Vector store loading (heap vs mmap)
+# ------------------------------------
+def _open_store(path: str) -> None:
+    """Child process: opens a store, runs one search and reports time and memory."""
+    from core.embeddings import load_vector_store
+
+    before = rss_mb()
+    start = time.perf_counter()
+    index, metadata = load_vector_store(path)
+    open_s = time.perf_counter() - start
+
+    query = np.asarray(np.load(os.path.join(path, "..", "queries.npy")), dtype="float32")
+    start = time.perf_counter()
+    _, indices = index.search(query, 5)
+    rows = [metadata[int(i)] for i in indices[0] if i != -1]
+    search_s = time.perf_counter() - start
+    after = rss_mb()
+
+    print(json.dumps({
+        "open_ms": open_s * 1000,
+        "search_ms": search_s * 1000,
+        "rss_delta_mb": after["rss"] - before["rss"],
+        "anon_delta_mb": after["anon"] - before["anon"],
+        "file_delta_mb": after["file"] - before["file"],
+        "rows": len(rows)
+    }))
+
+
+def bench_load(args: argparse.Namespace) -> None:
+    from core.embeddings import save_vector_store
+
+    vectors = synthetic_corpus(args.chunks)
+    metadata = synthetic_metadata(args.chunks)
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        np.save(os.path.join(tmp, "queries.npy"), vectors[:1])
+        for storage in ("heap", "mmap"):
+            path = os.path.join(tmp, storage)
+            save_vector_store(vectors, metadata, path, storage=storage, index_type="flat")
+            result = subprocess.run(
+                [sys.executable, __file__, "_open", path],
+                capture_output=True, text=True, check=True
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            rows.append({"storage": storage, **{k: v for k, v in stats.items() if k != "rows"}})
+
+    print_table(f"Cold open + first search, {args.chunks} chunks", rows)
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray, k: int) -> float:
+    """Fraction of the true top-k neighbours that appear in the returned top-k."""
+    hits = sum(len(set(f[:k]) & set(t[:k])) for f, t in zip(found, truth))
+    return hits / (len(truth) * k)
+
+
+def time_queries(search, queries: np.ndarray, k: int) -> Any:
+    """Runs queries one at a time (as the chat does) and returns (ms/query, indices)."""
+    results = []
+    start = time.perf_counter()
+    for q in queries:
+        results.append(search(q[None, :], k)[1][0])
+    return (time.perf_counter() - start) * 1000 / len(queries), np.array(results)
+
+
+# ------------------------------------
+# ANN index selection (flat vs HNSW vs IVF)
+# ------------------------------------
+def bench_ann(args: argparse.Namespace) -> None:
+    import faiss  # type: ignore
+    from core.index_factory import build_index, choose_index_type
+
+    rows = []
+    for n in args.sizes:
+        vectors = synthetic_corpus(n + args.queries, seed=n)
+        corpus, queries = vectors[:n], vectors[n:]
+
+        exact = faiss.IndexFlatL2(corpus.shape[1])
+        exact.add(corpus)
+        _, truth = exact.search(queries, args.k)
+
+        for index_type in ("flat", "hnsw", "ivf_flat"):
+            start = time.perf_counter()
+            index, config = build_index(corpus, index_type=index_type)
+            build_s = time.perf_counter() - start
+            latency, found = time_queries(index.search, queries, args.k)
+            rows.append({
+                "vectors": n,
+                "index": index_type,
+                "auto": "*" if choose_index_type(n) == index_type else "",
+                "build_s": build_s,
+                "ms/query": latency,
+                f"recall@{args.k}": recall_at_k(found, truth, args.k),
+                "params": ", ".join(f"{k}={v}" for k, v in config.items() if k != "index_type")
+            })
+
+    print_table("ANN index selection (* = chosen by auto)", rows)
+
+
+# ------------------------------------
+# Compressed storage (SQ8 / PQ + exact re-rank)
+# ------------------------------------
+def dir_size_mb(path: str, exclude: tuple = ()) -> float:
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path) if name not in exclude
+    ) / 1024 / 1024
+
+
+def bench_compress(args: argparse.Namespace) -> None:
+    import faiss  # type: ignore
+    import core.index_factory as index_factory
+    from core.embeddings import load_vector_store, save_vector_store
+
+    vectors = synthetic_corpus(args.chunks + args.queries)
+    corpus, queries = vectors[:args.chunks], vectors[args.chunks:]
+    metadata = synthetic_metadata(args.chunks)
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for compression in ("none", "sq8", "pq"):
+            for rerank in ((False,) if compression == "none" else (False, True)):
+                index_factory.VECTOR_RERANK = rerank
+                path = os.path.join(tmp, f"{compression}_{int(rerank)}")
+                save_vector_store(corpus, metadata, path, index_type="flat", compression=compression)
+                index, _ = load_vector_store(path)
+                latency, found = time_queries(index.search, queries, args.k)
+                base = getattr(index, "index", index)
+                rows.append({
+                    "compression": compression,
+                    "rerank": rerank,
+                    "disk_mb": dir_size_mb(path, exclude=("metadata.pkl",)),
+                    "ram_mb": len(faiss.serialize_index(base)) / 1024 / 1024,
+                    "ms/query": latency,
+                    f"recall@{args.k}": recall_at_k(found, truth, args.k)
+                })
+
+    print_table(f"Compressed flat index, {args.chunks} vectors (disk/RAM exclude metadata)", rows)
+
+
+# ------------------------------------
+# Batched multi-query search
+# ------------------------------------
+def synthetic_questions(n: int, seed: int = 0) -> List[str]:
+    rng = np.random.default_rng(seed)
+    words = "how do I reset the pump valve pressure error code part manual clause warranty".split()
+    return [" ".join(rng.choice(words, 8)) + f" {i}?" for i in range(n)]
+
+
+def bench_batch(args: argparse.Namespace) -> None:
+    from core.embeddings import save_vector_store, similarity_search, similarity_search_batch
+    from core.query_cache import query_cache
+
+    # Measure encoding, not cache lookups
+    query_cache.max_size = 0
+
+    metadata = synthetic_metadata(args.chunks)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = save_vector_store(synthetic_corpus(args.chunks), metadata, tmp, index_type="flat")
+
+    rows = []
+    for batch_size in args.batch_sizes:
+        questions = synthetic_questions(batch_size, seed=batch_size)
+
+        start = time.perf_counter()
+        for q in questions:
+            similarity_search(q, index, metadata, top_k=5)
+        loop_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        similarity_search_batch(questions, index, metadata, top_k=5)
+        batch_s = time.perf_counter() - start
+
+        rows.append({
+            "batch_size": batch_size,
+            "loop_qps": batch_size / loop_s,
+            "batch_qps": batch_size / batch_s,
+            "speedup": loop_s / batch_s
+        })
+
+    print_table(f"Query throughput, loop vs similarity_search_batch ({args.chunks} chunks)", rows)
+
+
+# ------------------------------------
+# Startup (lazy model loading)
+# ------------------------------------
+def _timed_import(statement: str) -> float:
+    """Runs a statement in a fresh interpreter and returns its wall time in seconds."""
+    code = f"import time; s = time.perf_counter(); {statement}; print(time.perf_counter() - s)"
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(args: argparse.Namespace) -> None:
+    rows = [
+        {"step": "import core.database", "seconds": _timed_import("import core.database")},
+        {"step": "import core.qa_engine", "seconds": _timed_import("import core.qa_engine")},
+        {"step": "first get_model()", "seconds": _timed_import("from core.embeddings import get_model; get_model()")},
+        {"step": "warm_up_model()", "seconds": _timed_import("from core.embeddings import warm_up_model; warm_up_model()")}
+    ]
+    print_table("Cold start (fresh interpreter per step)", rows)
+
+
+# ------------------------------------
+# Embedding backends (PyTorch vs int8 ONNX)
+# ------------------------------------
+def bench_backends(args: argparse.Namespace) -> None:
+    from core.embedding_backends import load_backend
+    from core.embeddings import EMBEDDING_MODEL_NAME, EMBEDDING_MODEL_PATH
+
+    source = EMBEDDING_MODEL_PATH or EMBEDDING_MODEL_NAME
+    chunks = [row["text"] for row in synthetic_metadata(args.texts)]
+    questions = synthetic_questions(args.texts)
+
+    backends = {name: load_backend(name, source) for name in ("torch", "onnx")}
+    outputs: Dict[str, Dict[str, np.ndarray]] = {}
+    rows = []
+
+    for name, backend in backends.items():
+        backend.encode(questions[:8])  # warm up
+        outputs[name] = {}
+        for label, texts, batch_size in (("chunks", chunks, 32), ("questions", questions, 1)):
+            start = time.perf_counter()
+            outputs[name][label] = backend.encode(texts, batch_size=batch_size)
+            elapsed = time.perf_counter() - start
+            rows.append({"backend": name, "texts": label, "batch_size": batch_size, "texts/s": len(texts) / elapsed})
+
+    print_table(f"Embedding throughput ({source})", rows)
+
+    parity = []
+    for label in ("chunks", "questions"):
+        a, b = outputs["torch"][label], outputs["onnx"][label]
+        cosine = (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+        parity.append({
+            "texts": label,
+            "mean_cosine": float(cosine.mean()),
+            "min_cosine": float(cosine.min()),
+            "parity": "PASS" if cosine.min() >= args.min_cosine else "FAIL"
+        })
+    print_table(f"ONNX int8 vs PyTorch parity (min cosine >= {args.min_cosine})", parity)
+
+
+# ------------------------------------
+# Concurrent sessions (micro-batching service)
+# ------------------------------------
+def bench_concurrent(args: argparse.Namespace) -> None:
+    import threading
+    import core.embeddings as embeddings
+    from core.query_cache import query_cache
+
+    # Measure encoding, not cache lookups
+    query_cache.max_size = 0
+    embeddings.get_model()
+
+    rows = []
+    for sessions in args.sessions:
+        for microbatch in (False, True):
+            embeddings.EMBEDDING_MICROBATCH = microbatch
+            latencies: List[float] = []
+            lock = threading.Lock()
+
+            def session(seed: int) -> None:
+                for q in synthetic_questions(args.queries, seed=seed):
+                    start = time.perf_counter()
+                    embeddings.encode_query(q)
+                    with lock:
+                        latencies.append(time.perf_counter() - start)
+
+            threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+            start = time.perf_counter()
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            elapsed = time.perf_counter() - start
+
+            ms = np.array(latencies) * 1000
+            rows.append({
+                "sessions": sessions,
+                "mode": "microbatch" if microbatch else "direct",
+                "queries/s": len(latencies) / elapsed,
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95))
+            })
+
+    print_table(f"Concurrent query encoding ({args.queries} queries per session)", rows)
+    print(json.dumps(embeddings.get_embedding_service_stats(), indent=2))
+
+
+# ------------------------------------
+# Lexical (BM25) index and hybrid retrieval
+# ------------------------------------
+def coded_texts(n: int, seed: int = 0) -> List[str]:
+    """Chunk texts of random words, each carrying one unique error code."""
+    rng = np.random.default_rng(seed)
+    words = np.array([f"w{i}" for i in range(5000)] + "pump valve pressure manual clause error part".split())
+    return [" ".join(rng.choice(words, 120)) + f" error ERR-{i:05d} occurred" for i in range(n)]
+
+
+def natural_texts(n: int, sentences: int = 2, seed: int = 0) -> List[str]:
+    """Short chunk texts of manual-like sentences over a small, common vocabulary."""
+    rng = np.random.default_rng(seed)
+    subjects = ["the pump", "the valve", "the operator", "the filter", "the motor", "the sensor", "the technician"]
+    verbs = ["should check", "must replace", "can adjust", "will inspect", "needs to clean", "may reset"]
+    objects = ["the pressure", "the inlet hose", "the warranty clause", "the power supply", "the drive belt",
+               "the oil level", "the safety switch", "the outlet pipe"]
+    times = ["before each use", "after maintenance", "every month", "when the light flashes",
+             "during start up", "once a year"]
+    return [
+        " ".join(
+            f"{rng.choice(subjects).capitalize()} {rng.choice(verbs)} {rng.choice(objects)} {rng.choice(times)}."
+            for _ in range(sentences)
+        )
+        for _ in range(n)
+    ]
+
+
+def bench_lexical(args: argparse.Namespace) -> None:
+    from core.lexical_index import LexicalIndex
+
+    rows = []
+    for n in args.chunks:
+        texts = coded_texts(n)
+        start = time.perf_counter()
+        lexical = LexicalIndex.build(texts)
+        build_s = time.perf_counter() - start
+
+        with tempfile.TemporaryDirectory() as tmp:
+            lexical.save(tmp)
+            size = dir_size_mb(tmp)
+
+        rng = np.random.default_rng(1)
+        targets = rng.integers(0, n, 200)
+        latencies = []
+        for target in targets:
+            start = time.perf_counter()
+            lexical.search(f"what does ERR-{target:05d} mean for the pump", 20)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        rows.append({
+            "chunks": n,
+            "build_s": build_s,
+            "size_mb": size,
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99))
+        })
+    print_table("BM25 index build and lookup latency", rows)
+
+    if args.skip_hybrid:
+        return
+
+    # Exact-code questions: how often is the chunk with that code in the top 5?
+    from core.embeddings import get_model, save_vector_store, similarity_search
+    from core.query_cache import query_cache
+
+    query_cache.max_size = 0
+    rows, natural_rows = [], []
+    # Small documents matter most: every chunk then sits in the dense candidate list
+    for n in args.hybrid_chunks:
+        texts = coded_texts(n)
+        metadata = [{"page": i + 1, "text": t, "has_images": False} for i, t in enumerate(texts)]
+        with tempfile.TemporaryDirectory() as tmp:
+            index = save_vector_store(get_model().encode(texts, batch_size=64), metadata, tmp, index_type="flat")
+            lexical = LexicalIndex.load(tmp)
+
+            targets = np.random.default_rng(2).integers(0, n, 100)
+            for mode in ("dense", "hybrid"):
+                hits = 0
+                start = time.perf_counter()
+                for target in targets:
+                    results = similarity_search(
+                        f"what does ERR-{target:05d} mean", index, metadata, 5, lexical=lexical, mode=mode
+                    )
+                    hits += any(r["page"] == target + 1 for r in results)
+                rows.append({
+                    "chunks": n,
+                    "mode": mode,
+                    "code_hit@5": hits / len(targets),
+                    "ms/query": (time.perf_counter() - start) * 1000 / len(targets)
+                })
+
+        # Natural-language questions: fusing BM25 must not cost the dense ranking its top hit
+        texts = natural_texts(n)
+        metadata = [{"page": i + 1, "text": t, "has_images": False} for i, t in enumerate(texts)]
+        with tempfile.TemporaryDirectory() as tmp:
+            index = save_vector_store(get_model().encode(texts, batch_size=64), metadata, tmp, index_type="flat")
+            lexical = LexicalIndex.load(tmp)
+
+            targets = np.random.default_rng(3).integers(0, n, 100)
+            for kind in ("chunk text", "sentence"):
+                questions = [texts[t] if kind == "chunk text" else texts[t].split(". ")[0] + "?" for t in targets]
+                top = {}
+                for mode in ("dense", "hybrid"):
+                    top[mode] = [
+                        similarity_search(q, index, metadata, 5, lexical=lexical, mode=mode)[0]["page"]
+                        for q in questions
+                    ]
+                dense_hits = {i for i, (page, t) in enumerate(zip(top["dense"], targets)) if page == t + 1}
+                natural_rows.append({
+                    "chunks": n,
+                    "question": kind,
+                    "dense_hit@1": len(dense_hits) / len(targets),
+                    "hybrid_hit@1": np.mean([page == t + 1 for page, t in zip(top["hybrid"], targets)]),
+                    "lost": sum(top["hybrid"][i] != top["dense"][i] for i in dense_hits)
+                })
+
+    print_table("Exact error-code questions", rows)
+    print_table("Natural-language questions (lost = dense hits@1 that hybrid drops)", natural_rows)
+    if any(row["lost"] for row in natural_rows):
+        raise SystemExit("❌ Hybrid retrieval lost dense hits@1 on natural-language questions")
+
+
+# ------------------------------------
+# Incremental re-index of a revised PDF
+# ------------------------------------
+def bench_reindex(args: argparse.Namespace) -> None:
+    from core.embeddings import create_vector_store, get_model, update_vector_store
+    from core.pdf_processor import page_hash
+
+    texts = coded_texts(args.pages * 3)
+    docs: List[Dict[str, Any]] = [
+        {"text": t, "page": i // 3 + 1, "has_images": False, "page_hash": page_hash(texts[(i // 3) * 3])}
+        for i, t in enumerate(texts)
+    ]
+    rng = np.random.default_rng(3)
+    changed = set(rng.choice(args.pages, max(1, int(args.pages * args.changed)), replace=False).tolist())
+    revised = [
+        dict(d, text=d["text"] + " (revised)", page_hash=page_hash(f"rev {d['page']}")) if d["page"] - 1 in changed else d
+        for d in docs
+    ]
+    get_model()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        create_vector_store(docs, os.path.join(tmp, "v1"))
+
+        start = time.perf_counter()
+        create_vector_store(revised, os.path.join(tmp, "full"))
+        full_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        _, _, report = update_vector_store(revised, os.path.join(tmp, "v2"), os.path.join(tmp, "v1"))
+        incremental_s = time.perf_counter() - start
+
+    print_table(f"Re-index of a {args.pages}-page revision ({len(changed)} pages changed)", [
+        {"mode": "full rebuild", "seconds": full_s, "embedded_chunks": len(revised)},
+        {"mode": "incremental", "seconds": incremental_s, "embedded_chunks": report["embedded_chunks"]}
+    ])
+
+
+# ------------------------------------
+# Chunk metadata (pickle vs columnar)
+# ------------------------------------
+def _open_metadata(path: str) -> None:
+    """Child process: opens a store's metadata, reads 5 rows and reports time and memory."""
+    from core.embeddings import load_metadata
+
+    before = rss_mb()
+    start = time.perf_counter()
+    metadata = load_metadata(path)
+    open_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = [metadata[i] for i in range(0, len(metadata), max(1, len(metadata) // 5))[:5]]
+    read_s = time.perf_counter() - start
+    after = rss_mb()
+
+    print(json.dumps({
+        "open_ms": open_s * 1000,
+        "top5_ms": read_s * 1000,
+        "rss_delta_mb": after["rss"] - before["rss"],
+        "anon_delta_mb": after["anon"] - before["anon"],
+        "rows": len(rows)
+    }))
+
+
+def bench_metadata(args: argparse.Namespace) -> None:
+    import pickle
+    from core.embeddings import _write_columnar_metadata
+
+    metadata = synthetic_metadata(args.chunks)
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for fmt in ("pickle", "columnar"):
+            path = os.path.join(tmp, fmt)
+            os.makedirs(path)
+            if fmt == "pickle":
+                with open(os.path.join(path, "metadata.pkl"), "wb") as f:
+                    pickle.dump(metadata, f)
+            else:
+                _write_columnar_metadata(metadata, path)
+            result = subprocess.run(
+                [sys.executable, __file__, "_open_metadata", path],
+                capture_output=True, text=True, check=True
+            )
+            stats = json.loads(result.stdout.strip().splitlines()[-1])
+            rows.append({
+                "format": fmt,
+                "disk_mb": dir_size_mb(path),
+                **{k: v for k, v in stats.items() if k != "rows"}
+            })
+
+    print_table(f"Metadata open + 5 row reads, {args.chunks} chunks", rows)
+
+
+# ------------------------------------
+# Interactive latency during ingestion (compute scheduler)
+# ------------------------------------
+def bench_contention(args: argparse.Namespace) -> None:
+    import threading
+    import core.embeddings as embeddings
+    from core.compute_scheduler import COMPUTE_THREADS, ComputeScheduler
+    from core.query_cache import query_cache
+
+    # Measure encoding, not cache lookups
+    query_cache.max_size = 0
+    dimension = embeddings.get_model().encode(["dimension"]).shape[1]
+
+    metadata = synthetic_metadata(args.chunks)
+    with tempfile.TemporaryDirectory() as tmp:
+        index = embeddings.save_vector_store(synthetic_corpus(args.chunks, dim=dimension), metadata, tmp, index_type="flat")
+    ingest_texts = coded_texts(args.ingest_chunks)
+
+    unmanaged = ComputeScheduler(COMPUTE_THREADS, COMPUTE_THREADS, COMPUTE_THREADS, 1000, 1000)
+    rows = []
+    for label, scheduler in (("unmanaged", unmanaged), ("scheduled", ComputeScheduler())):
+        embeddings.compute_scheduler = scheduler
+        for ingesting in (False, True):
+            stop = threading.Event()
+            latencies: List[float] = []
+            lock = threading.Lock()
+
+            def ingest() -> None:
+                while not stop.is_set():
+                    embeddings.encode_documents(ingest_texts)
+
+            def session(seed: int) -> None:
+                for q in synthetic_questions(args.queries, seed=seed):
+                    start = time.perf_counter()
+                    embeddings.similarity_search(q, index, metadata, top_k=5)
+                    with lock:
+                        latencies.append((time.perf_counter() - start) * 1000)
+
+            background = threading.Thread(target=ingest) if ingesting else None
+            if background:
+                background.start()
+                time.sleep(0.5)
+            sessions = [threading.Thread(target=session, args=(i,)) for i in range(args.sessions)]
+            for t in sessions:
+                t.start()
+            for t in sessions:
+                t.join()
+            stop.set()
+            if background:
+                background.join()
+
+            rows.append({
+                "threads": label,
+                "ingesting": ingesting,
+                "p50_ms": float(np.percentile(latencies, 50)),
+                "p99_ms": float(np.percentile(latencies, 99))
+            })
+
+    print_table(f"Query latency, {args.sessions} sessions ({args.chunks} chunks, {COMPUTE_THREADS} cores)", rows)
+
+
+# ------------------------------------
+# PCA dimensionality reduction
+# ------------------------------------
+def bench_pca(args: argparse.Namespace) -> None:
+    import faiss  # type: ignore
+    from core.embeddings import load_vector_store, save_vector_store
+
+    vectors = synthetic_corpus(args.chunks + args.queries, decay=args.decay)
+    corpus, queries = vectors[:args.chunks], vectors[args.chunks:]
+    metadata = synthetic_metadata(args.chunks)
+
+    exact = faiss.IndexFlatL2(corpus.shape[1])
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for dim in args.dims:
+            path = os.path.join(tmp, f"pca_{dim}")
+            start = time.perf_counter()
+            save_vector_store(corpus, metadata, path, storage="heap", index_type="flat", pca_dim=dim)
+            build_s = time.perf_counter() - start
+            index, _ = load_vector_store(path)
+            latency, found = time_queries(index.search, queries, args.k)
+            rows.append({
+                "dims": min(dim, corpus.shape[1]),
+                "index_mb": os.path.getsize(os.path.join(path, "index.faiss")) / 1024 / 1024,
+                "build_s": build_s,
+                "ms/query": latency,
+                f"recall@{args.k}": recall_at_k(found, truth, args.k)
+            })
+
+    print_table(f"PCA-reduced flat index, {args.chunks} vectors (spectrum decay {args.decay})", rows)
+
+
+# ------------------------------------
+# Binary (sign-bit) prefilter + exact re-rank
+# ------------------------------------
+def bench_binary(args: argparse.Namespace) -> None:
+    import faiss  # type: ignore
+    import core.index_factory as index_factory
+    from core.index_factory import build_index
+
+    rows = []
+    for n in args.sizes:
+        vectors = synthetic_corpus(n + args.queries, seed=n)
+        corpus, queries = vectors[:n], vectors[n:]
+        del vectors
+
+        exact = faiss.IndexFlatL2(corpus.shape[1])
+        exact.add(corpus)
+        latency, truth = time_queries(exact.search, queries, args.k)
+        rows.append({
+            "vectors": n,
+            "index": "IndexFlatL2",
+            "candidates": "-",
+            "index_mb": corpus.nbytes / 1024 / 1024,
+            "ms/query": latency,
+            "queries/s": 1000 / latency,
+            f"recall@{args.k}": 1.0
+        })
+        del exact
+
+        for candidates in args.candidates:
+            index_factory.BINARY_CANDIDATES = candidates
+            index, _ = build_index(corpus, compression="binary")
+            latency, found = time_queries(index.search, queries, args.k)
+            rows.append({
+                "vectors": n,
+                "index": "binary + re-rank",
+                "candidates": candidates,
+                "index_mb": index.index.ntotal * index.index.code_size / 1024 / 1024,
+                "ms/query": latency,
+                "queries/s": 1000 / latency,
+                f"recall@{args.k}": recall_at_k(found, truth, args.k)
+            })
+            del index
+        del corpus
+
+    print_table("Binary prefilter vs exact flat search (index_mb excludes the re-rank vectors)", rows)
+
+
+# ------------------------------------
+# PDF parsing (single pass vs dual parser)
+# ------------------------------------
+def synthetic_pdf(path: str, pages: int, image_every: int = 3, seed: int = 0) -> None:
+    """Writes a PDF with a page of prose per page and a photo-like image every image_every pages."""
+    import fitz  # PyMuPDF
+    from io import BytesIO
+    from PIL import Image
+
+    rng = np.random.default_rng(seed)
+    words = "the pump valve pressure must be checked before each maintenance cycle according to section".split()
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        text = ". ".join(" ".join(rng.choice(words, 12)) for _ in range(30)) + "."
+        page.insert_textbox(fitz.Rect(40, 40, 560, 500), text, fontsize=9)
+        if page_num % image_every == 0:
+            pixels = rng.integers(0, 255, (300, 400, 3), dtype="uint8")
+            buffer = BytesIO()
+            Image.fromarray(pixels).save(buffer, format="JPEG", quality=80)
+            page.insert_image(fitz.Rect(40, 520, 440, 820), stream=buffer.getvalue())
+    doc.save(path)
+    doc.close()
+
+
+def _dual_parser_pass(path: str) -> int:
+    """The former process_pdf path: PyMuPDF for images, then pypdf again for text."""
+    import fitz  # PyMuPDF
+    from pypdf import PdfReader
+    from core.pdf_processor import encode_image
+
+    doc = fitz.open(path)
+    for page in doc:
+        for img in page.get_images()[:3]:
+            encode_image(doc.extract_image(img[0])["image"])
+    doc.close()
+
+    reader = PdfReader(path)
+    for page in reader.pages:
+        page.extract_text()
+    return len(reader.pages)
+
+
+def bench_parse(args: argparse.Namespace) -> None:
+    import contextlib
+    import io
+    from core.pdf_processor import process_pdf
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        synthetic_pdf(path, args.pages)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        runs: List[Tuple[str, Callable[[], Any]]] = [("dual (pymupdf + pypdf)", lambda: _dual_parser_pass(path))]
+        for backend in ("pymupdf", "pypdf"):
+            runs.append((f"single ({backend})", functools.partial(process_pdf, path, backend=backend)))
+
+        for name, run in runs:
+            # Per-page progress lines would drown the table
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                run()
+                elapsed = time.perf_counter() - start
+            rows.append({"path": name, "seconds": elapsed, "pages/s": args.pages / elapsed})
+
+    print_table(f"Parsing a {args.pages}-page PDF ({size_mb:.1f} MB, image every 3 pages)", rows)
+
+
+def bench_parallel(args: argparse.Namespace) -> None:
+    import contextlib
+    import io
+    from core.pdf_processor import process_pdf
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.pdf")
+        synthetic_pdf(path, args.pages)
+
+        serial = None
+        for workers in args.workers:
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                result = process_pdf(path, workers=workers)
+                elapsed = time.perf_counter() - start
+            if serial is None:
+                serial = process_pdf(path, workers=1) if workers != 1 else result
+            rows.append({
+                "workers": workers,
+                "seconds": elapsed,
+                "pages/s": args.pages / elapsed,
+                "chunks": len(result[0]),
+                "identical": result == serial
+            })
+
+    print_table(f"Page extraction of a {args.pages}-page PDF on {os.cpu_count()} CPUs", rows)
+
+
+# ------------------------------------
+# Streaming ingestion (bounded memory)
+# ------------------------------------
+def _peak_rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _ingest(path: str, mode: str) -> None:
+    """Child process: ingests a PDF in one mode and reports time and peak memory."""
+    import contextlib
+    import io
+    import pickle
+    from core.embeddings import create_vector_store, get_model
+
+    get_model()
+    baseline = rss_mb()["rss"]
+    save_path = os.path.join(os.path.dirname(path), mode)
+    start = time.perf_counter()
+    stages: Dict[str, Any] = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "in-memory":
+            from core.pdf_processor import process_pdf
+            docs, page_images = process_pdf(path)
+            create_vector_store(docs, save_path)
+            with open(os.path.join(save_path, "images.pkl"), "wb") as f:
+                pickle.dump(page_images, f)
+        else:
+            from core.ingest_pipeline import ingest_pdf
+            _, _, report = ingest_pdf(path, save_path)
+            stages = {name: stats["peak_rss_mb"] - baseline for name, stats in report["stages"].items()}
+
+    print(json.dumps({
+        "seconds": time.perf_counter() - start,
+        "peak_over_baseline_mb": _peak_rss_mb() - baseline,
+        "stages": stages
+    }))
+
+
+def bench_ingest(args: argparse.Namespace) -> None:
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"doc_{pages}.pdf")
+            synthetic_pdf(path, pages, image_every=args.image_every)
+            size_mb = os.path.getsize(path) / 1024 / 1024
+            for mode in ("in-memory", "streaming"):
+                result = subprocess.run(
+                    [sys.executable, __file__, "_ingest", path, mode],
+                    capture_output=True, text=True, check=True
+                )
+                stats = json.loads(result.stdout.strip().splitlines()[-1])
+                rows.append({
+                    "pages": pages,
+                    "pdf_mb": size_mb,
+                    "mode": mode,
+                    "seconds": stats["seconds"],
+                    "peak_mb": stats["peak_over_baseline_mb"],
+                    "stage_peaks_mb": ", ".join(f"{k}={v:.0f}" for k, v in stats["stages"].items()) or "-"
+                })
+
+    print_table("Ingestion peak RSS above the loaded model (stage peaks: RSS while the stage was busy)", rows)
+
+
+# ------------------------------------
+# Deferred image extraction
+# ------------------------------------
+def bench_images(args: argparse.Namespace) -> None:
+    import contextlib
+    import io
+    from core.image_store import ImageCache, LazyPageImages, load_page_images
+    from core.ingest_pipeline import ingest_pdf
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "images.pdf")
+        synthetic_pdf(path, args.pages, image_every=1)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+
+        for mode in ("eager", "lazy"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                _, _, report = ingest_pdf(path, os.path.join(tmp, mode), image_mode=mode)
+            rows.append({
+                "mode": mode,
+                "ingest_s": report["total_seconds"],
+                "extract_busy_s": report["stages"]["extract"]["busy_s"],
+                "images": report["images"]
+            })
+        print_table(f"Ingesting a {args.pages}-page PDF with an image on every page ({size_mb:.1f} MB)", rows)
+
+        # Pages an answer would cite, looked up twice: cold (extracted) and from the cache
+        lazy = load_page_images(os.path.join(tmp, "lazy"))
+        assert isinstance(lazy, LazyPageImages)
+        page_images = LazyPageImages(
+            lazy.pdf_path, lazy.refs, ImageCache(os.path.join(tmp, "image_cache"), 256 * 1024 * 1024)
+        )
+        pages = np.random.default_rng(0).choice(sorted(page_images), args.lookups, replace=False)
+        rows = []
+        for name in ("first use", "cached"):
+            start = time.perf_counter()
+            for page in pages:
+                page_images.get(int(page), [])
+            rows.append({"lookup": name, "ms/page": (time.perf_counter() - start) * 1000 / len(pages)})
+        eager_images = load_page_images(os.path.join(tmp, "eager"))
+        identical = all(page_images.get(int(p), []) == eager_images.get(int(p), []) for p in pages)
+        print_table(f"Lazy image lookups of {len(pages)} pages (identical to eager: {identical})", rows)
+
+
+# ------------------------------------
+# Per-page image files vs images.pkl
+# ------------------------------------
+def _read_bytes() -> int:
+    with open("/proc/self/io") as f:
+        for line in f:
+            if line.startswith("rchar:"):
+                return int(line.split()[1])
+    return 0
+
+
+def bench_image_files(args: argparse.Namespace) -> None:
+    import contextlib
+    import io
+    import pickle
+    import tracemalloc
+    from core.image_store import load_page_images
+    from core.ingest_pipeline import ingest_pdf
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "images.pdf")
+        synthetic_pdf(path, args.pages, image_every=1)
+        files_path = os.path.join(tmp, "files")
+        with contextlib.redirect_stdout(io.StringIO()):
+            _, _, report = ingest_pdf(path, files_path, image_mode="eager")
+
+        # The same images in the former single-pickle layout
+        pickle_path = os.path.join(tmp, "pickle")
+        os.makedirs(pickle_path)
+        with open(os.path.join(pickle_path, "images.pkl"), "wb") as f:
+            pickle.dump(dict(load_page_images(files_path)), f)
+
+        # Each question shows the images of the pages its top chunks come from
+        rng = np.random.default_rng(0)
+        questions = [rng.choice(args.pages, 3, replace=False) + 1 for _ in range(args.questions)]
+
+        for layout, store_path in (("images.pkl", pickle_path), ("per-page files", files_path)):
+            for state in ("cold store", "cached store"):
+                tracemalloc.start()
+                read_before = _read_bytes()
+                start = time.perf_counter()
+                page_images = None if state == "cold store" else load_page_images(store_path)
+                resident = tracemalloc.get_traced_memory()[0]
+                for pages in questions:
+                    # A cold store is opened again for every question
+                    images = (page_images or load_page_images(store_path))
+                    shown = [image for page in pages for image in images.get(int(page), [])]
+                    assert len(shown) == 3
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                rows.append({
+                    "layout": layout,
+                    "state": state,
+                    "ms/question": elapsed * 1000 / len(questions),
+                    "kb_read/question": (_read_bytes() - read_before) / 1024 / len(questions),
+                    "peak_mb": peak / 1024 / 1024,
+                    "resident_mb": resident / 1024 / 1024
+                })
+                del page_images
+
+    print_table(
+        f"Images of 3 pages per question, {args.questions} questions, {report['images']}-image document "
+        "(resident: held by a cached store)", rows
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("load", help="cold-open time and RSS of heap vs mmap stores")
+    p.add_argument("--chunks", type=int, default=50000)
+    p.set_defaults(func=bench_load)
+
+    p = sub.add_parser("ann", help="recall@k and latency of flat, HNSW and IVF-Flat by corpus size")
+    p.add_argument("--sizes", type=int, nargs="+", default=[5000, 20000, 100000, 500000])
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=5)
+    p.set_defaults(func=bench_ann)
+
+    p = sub.add_parser("compress", help="size and recall@k of SQ8/PQ compressed indices")
+    p.add_argument("--chunks", type=int, default=50000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=5)
+    p.set_defaults(func=bench_compress)
+
+    p = sub.add_parser("batch", help="throughput of similarity_search_batch vs a loop")
+    p.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 64, 512])
+    p.add_argument("--chunks", type=int, default=10000)
+    p.set_defaults(func=bench_batch)
+
+    p = sub.add_parser("startup", help="import time of core modules and model load time")
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("backends", help="throughput and cosine parity of the torch and onnx backends")
+    p.add_argument("--texts", type=int, default=512)
+    p.add_argument("--min-cosine", type=float, default=0.98)
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("concurrent", help="query encoding under concurrent sessions, direct vs micro-batched")
+    p.add_argument("--sessions", type=int, nargs="+", default=[1, 4, 16])
+    p.add_argument("--queries", type=int, default=50)
+    p.set_defaults(func=bench_concurrent)
+
+    p = sub.add_parser("lexical", help="BM25 build/lookup cost and hybrid vs dense on exact codes and natural questions")
+    p.add_argument("--chunks", type=int, nargs="+", default=[5000, 50000])
+    p.add_argument("--hybrid-chunks", type=int, nargs="+", default=[60, 200, 2000])
+    p.add_argument("--skip-hybrid", action="store_true")
+    p.set_defaults(func=bench_lexical)
+
+    p = sub.add_parser("reindex", help="full rebuild vs page-hash incremental re-index of a revision")
+    p.add_argument("--pages", type=int, default=900)
+    p.add_argument("--changed", type=float, default=0.02, help="fraction of pages changed")
+    p.set_defaults(func=bench_reindex)
+
+    p = sub.add_parser("metadata", help="open time and RSS of pickled vs columnar chunk metadata")
+    p.add_argument("--chunks", type=int, default=50000)
+    p.set_defaults(func=bench_metadata)
+
+    p = sub.add_parser("contention", help="query latency while a PDF is ingested, with and without thread budgets")
+    p.add_argument("--sessions", type=int, default=4)
+    p.add_argument("--queries", type=int, default=50)
+    p.add_argument("--chunks", type=int, default=20000)
+    p.add_argument("--ingest-chunks", type=int, default=256)
+    p.set_defaults(func=bench_contention)
+
+    p = sub.add_parser("pca", help="index size, latency and recall@k per PCA target dimension")
+    p.add_argument("--dims", type=int, nargs="+", default=[384, 192, 128, 64])
+    p.add_argument("--chunks", type=int, default=50000)
+    p.add_argument("--queries", type=int, default=200)
+    p.add_argument("--k", type=int, default=5)
+    p.add_argument("--decay", type=float, default=0.5, help="variance decay of the synthetic corpus")
+    p.set_defaults(func=bench_pca)
+
+    p = sub.add_parser("binary", help="throughput and recall@k of the binary prefilter vs IndexFlatL2")
+    p.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000, 5000000])
+    p.add_argument("--candidates", type=int, nargs="+", default=[256, 512])
+    p.add_argument("--queries", type=int, default=100)
+    p.add_argument("--k", type=int, default=5)
+    p.set_defaults(func=bench_binary)
+
+    p = sub.add_parser("parse", help="pages/s of single-pass PDF parsing per backend vs the dual-parser path")
+    p.add_argument("--pages", type=int, default=300)
+    p.set_defaults(func=bench_parse)
+
+    p = sub.add_parser("parallel", help="page extraction time by worker count, checked identical to serial")
+    p.add_argument("--pages", type=int, default=1500)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    p.set_defaults(func=bench_parallel)
+
+    p = sub.add_parser("ingest", help="peak RSS of streaming ingestion per stage vs the in-memory path")
+    p.add_argument("--pages", type=int, nargs="+", default=[400, 800])
+    p.add_argument("--image-every", type=int, default=1)
+    p.set_defaults(func=bench_ingest)
+
+    p = sub.add_parser("images", help="ingestion time of eager vs lazy image extraction and lazy lookup latency")
+    p.add_argument("--pages", type=int, default=400)
+    p.add_argument("--lookups", type=int, default=20)
+    p.set_defaults(func=bench_images)
+
+    p = sub.add_parser("imagefiles", help="per-question I/O and memory of per-page image files vs images.pkl")
+    p.add_argument("--pages", type=int, default=400)
+    p.add_argument("--questions", type=int, default=50)
+    p.set_defaults(func=bench_image_files)
+
+    p = sub.add_parser("_ingest")
+    p.add_argument("path")
+    p.add_argument("mode")
+    p.set_defaults(func=lambda a: _ingest(a.path, a.mode))
+
+    p = sub.add_parser("_open_metadata")
+    p.add_argument("path")
+    p.set_defaults(func=lambda a: _open_metadata(a.path))
+
+    p = sub.add_parser("_open")
+    p.add_argument("path")
+    p.set_defaults(func=lambda a: _open_store(a.path))
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from core.embedding_service import Histogram
+
+# Cores available to the app's compute (torch, FAISS, ONNX Runtime)
+COMPUTE_THREADS = int(os.getenv("COMPUTE_THREADS", str(os.cpu_count() or 1)))
+
+# Thread budget of background ingestion (parsing, embedding and indexing a PDF);
+# the remaining cores stay free for interactive search and query encoding
+INGEST_THREADS = int(os.getenv("INGEST_THREADS", str(max(1, COMPUTE_THREADS // 2))))
+
+# Threads per interactive call; each session's query is small, so one or two
+# threads per call beat many calls fighting over every core
+INTERACTIVE_THREADS = int(os.getenv("INTERACTIVE_THREADS", "1"))
+
+# Concurrent calls admitted per lane; further callers wait for a slot
+INTERACTIVE_CONCURRENCY = int(os.getenv("INTERACTIVE_CONCURRENCY", str(max(2, COMPUTE_THREADS))))
+INGEST_CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "1"))
+
+LANES = ("interactive", "ingestion")
+
+
+class ComputeScheduler:
+    """
+    Assigns thread budgets to interactive and background ingestion work.
+
+    FAISS uses OpenMP, whose thread count is set per calling thread, so each
+    lane gets its own budget. Torch's intra-op pool is process-wide: it is
+    capped at INGEST_THREADS while any ingestion runs and restored to
+    COMPUTE_THREADS afterwards, which keeps cores free for interactive calls.
+    """
+
+    def __init__(
+        self,
+        compute_threads: int = COMPUTE_THREADS,
+        ingest_threads: int = INGEST_THREADS,
+        interactive_threads: int = INTERACTIVE_THREADS,
+        interactive_concurrency: int = INTERACTIVE_CONCURRENCY,
+        ingest_concurrency: int = INGEST_CONCURRENCY
+    ):
+        self.compute_threads = max(1, compute_threads)
+        self.budgets = {
+            "interactive": max(1, min(interactive_threads, self.compute_threads)),
+            "ingestion": max(1, min(ingest_threads, self.compute_threads))
+        }
+        self._slots = {
+            "interactive": threading.BoundedSemaphore(max(1, interactive_concurrency)),
+            "ingestion": threading.BoundedSemaphore(max(1, ingest_concurrency))
+        }
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._active = {lane: 0 for lane in LANES}
+        self._stats: Dict[str, Dict[str, Any]] = {
+            lane: {
+                "calls": 0,
+                "max_active": 0,
+                "waited": 0,
+                "wait_ms": Histogram([0.1, 1, 5, 20, 100, 500, 2000]),
+                "run_ms": Histogram([1, 5, 10, 20, 50, 100, 500, 5000])
+            }
+            for lane in LANES
+        }
+        # Interactive latency split by whether ingestion was running at the time
+        self._contended_ms = Histogram([1, 5, 10, 20, 50, 100, 500, 5000])
+        self._uncontended_ms = Histogram([1, 5, 10, 20, 50, 100, 500, 5000])
+
+    @contextmanager
+    def interactive(self) -> Iterator[None]:
+        """Runs a search or query encode within the interactive budget."""
+        with self._run("interactive"):
+            yield
+
+    @contextmanager
+    def ingestion(self) -> Iterator[None]:
+        """Runs background ingestion work (embedding, index building) within its budget."""
+        with self._run("ingestion"):
+            yield
+
+    @contextmanager
+    def _run(self, lane: str) -> Iterator[None]:
+        # Nested calls (e.g. a search inside ingestion) run in the outer lane
+        if getattr(self._local, "lane", None) is not None:
+            yield
+            return
+
+        queued = time.perf_counter()
+        self._slots[lane].acquire()
+        started = time.perf_counter()
+
+        with self._lock:
+            self._active[lane] += 1
+            stats = self._stats[lane]
+            stats["calls"] += 1
+            stats["max_active"] = max(stats["max_active"], self._active[lane])
+            stats["wait_ms"].observe((started - queued) * 1000)
+            if started - queued > 1e-4:
+                stats["waited"] += 1
+            contended = self._active["ingestion"] > 0
+            if lane == "ingestion" and self._active[lane] == 1:
+                self._set_torch_threads(self.budgets["ingestion"])
+
+        self._local.lane = lane
+        self._set_faiss_threads(self.budgets[lane])
+        try:
+            yield
+        finally:
+            self._local.lane = None
+            self._set_faiss_threads(self.compute_threads)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            with self._lock:
+                self._active[lane] -= 1
+                self._stats[lane]["run_ms"].observe(elapsed_ms)
+                if lane == "interactive":
+                    (self._contended_ms if contended else self._uncontended_ms).observe(elapsed_ms)
+                if lane == "ingestion" and self._active[lane] == 0:
+                    self._set_torch_threads(self.compute_threads)
+            self._slots[lane].release()
+
+    def _set_faiss_threads(self, threads: int) -> None:
+        faiss = sys.modules.get("faiss")
+        if faiss is not None:
+            faiss.omp_set_num_threads(threads)
+
+    def _set_torch_threads(self, threads: int) -> None:
+        # Never import torch here; it is only configured once the model has loaded it
+        torch = sys.modules.get("torch")
+        if torch is not None:
+            torch.set_num_threads(threads)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns thread budgets, per-lane load and interactive latency under contention."""
+        with self._lock:
+            result: Dict[str, Any] = {
+                "compute_threads": self.compute_threads,
+                "budgets": dict(self.budgets),
+                "active": dict(self._active)
+            }
+            for lane in LANES:
+                stats = self._stats[lane]
+                result[lane] = {
+                    "calls": stats["calls"],
+                    "max_active": stats["max_active"],
+                    "waited": stats["waited"],
+                    "wait_ms": stats["wait_ms"].snapshot(),
+                    "run_ms": stats["run_ms"].snapshot()
+                }
+            result["interactive_ms_during_ingestion"] = self._contended_ms.snapshot()
+            result["interactive_ms_idle"] = self._uncontended_ms.snapshot()
+            return result
+
+
+# Process-wide scheduler shared by all Streamlit sessions
+compute_scheduler = ComputeScheduler()
+
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """Returns statistics of the shared compute scheduler."""
+    return compute_scheduler.stats()
@@ -3,6 +3,7 @@ import bcrypt
 from datetime import datetime
 from typing import List, Dict, Optional
 import os
+import shutil
 
 DB_PATH = "data/users.db"
 
@@ -42,10 +43,20 @@ def init_database():
             num_chunks INTEGER,
             num_images INTEGER,
             is_active BOOLEAN DEFAULT 1,
+            content_hash TEXT,
+            vector_path TEXT,
             FOREIGN KEY (uploaded_by) REFERENCES users(id)
         )
     """)
     
+    # Migrate databases created before upload deduplication
+    cursor.execute("PRAGMA table_info(pdfs)")
+    pdf_columns = {row[1] for row in cursor.fetchall()}
+    for column in ("content_hash", "vector_path"):
+        if column not in pdf_columns:
+            cursor.execute(f"ALTER TABLE pdfs ADD COLUMN {column} TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_pdfs_content_hash ON pdfs(content_hash)")
+    
     # Chat history table
     cursor.execute("""
         CREATE TABLE IF NOT EXISTS chat_history (
@@ -210,22 +221,107 @@ def delete_user(user_id: int) -> bool:
 # ============================================
 
 def add_pdf(filename: str, original_name: str, uploaded_by: int,
-            file_size: int, num_pages: int, num_chunks: int, num_images: int) -> int:
+            file_size: int, num_pages: int, num_chunks: int, num_images: int,
+            content_hash: Optional[str] = None, vector_path: Optional[str] = None) -> int:
     """Add a PDF to the database"""
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
     cursor.execute("""
         INSERT INTO pdfs (filename, original_name, uploaded_by, file_size, 
-                         num_pages, num_chunks, num_images)
-        VALUES (?, ?, ?, ?, ?, ?, ?)
-    """, (filename, original_name, uploaded_by, file_size, num_pages, num_chunks, num_images))
+                         num_pages, num_chunks, num_images, content_hash, vector_path)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (filename, original_name, uploaded_by, file_size, num_pages, num_chunks, num_images,
+          content_hash, vector_path))
     
     pdf_id = cursor.lastrowid
     conn.commit()
     conn.close()
     return pdf_id
 
+def replace_pdf(pdf_id: int, filename: str, file_size: int,
+                num_pages: int, num_chunks: int, num_images: int,
+                content_hash: Optional[str] = None, vector_path: Optional[str] = None) -> bool:
+    """Point an existing PDF at a new revision, keeping its id and chat history"""
+    try:
+        conn = sqlite3.connect(DB_PATH)
+        cursor = conn.cursor()
+        cursor.execute("SELECT filename, vector_path FROM pdfs WHERE id = ?", (pdf_id,))
+        row = cursor.fetchone()
+        cursor.execute("""
+            UPDATE pdfs SET filename = ?, file_size = ?, num_pages = ?, num_chunks = ?,
+                            num_images = ?, content_hash = ?, vector_path = ?,
+                            upload_date = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (filename, file_size, num_pages, num_chunks, num_images, content_hash, vector_path, pdf_id))
+        conn.commit()
+        conn.close()
+    except:
+        return False
+
+    if row:
+        release_vector_store(row[1] or default_vector_path(row[0]))
+    return True
+
+def default_vector_path(filename: str) -> str:
+    """Vector store directory of PDFs uploaded before stores were recorded in the table"""
+    return f"data/vectorstore/{filename.replace('.pdf', '')}"
+
+def find_pdf_by_hash(content_hash: str) -> Optional[Dict]:
+    """Find an active PDF with the same file content"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT id, filename, original_name, file_size, num_pages, num_chunks, num_images, vector_path
+        FROM pdfs
+        WHERE content_hash = ? AND is_active = 1
+        ORDER BY upload_date
+        LIMIT 1
+    """, (content_hash,))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return None
+    return {
+        "id": row[0],
+        "filename": row[1],
+        "original_name": row[2],
+        "file_size": row[3],
+        "num_pages": row[4],
+        "num_chunks": row[5],
+        "num_images": row[6],
+        "vector_path": row[7] or default_vector_path(row[1])
+    }
+
+def vector_store_refcount(vector_path: str) -> int:
+    """Number of active PDFs that share a vector store"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    cursor.execute("SELECT filename, vector_path FROM pdfs WHERE is_active = 1")
+    target = os.path.normpath(vector_path)
+    count = sum(
+        1 for filename, path in cursor.fetchall()
+        if os.path.normpath(path or default_vector_path(filename)) == target
+    )
+    conn.close()
+    return count
+
+def release_vector_store(vector_path: str) -> bool:
+    """Delete a vector store once no active PDF references it. Returns True if it was deleted"""
+    if vector_store_refcount(vector_path) > 0 or not os.path.isdir(vector_path):
+        return False
+    try:
+        shutil.rmtree(vector_path)
+        # Imported lazily so the database layer does not depend on FAISS
+        from core.vector_cache import vector_store_cache
+        vector_store_cache.invalidate(vector_path)
+        print(f"🗑️ Removed unreferenced vector store {vector_path}")
+        return True
+    except Exception as e:
+        print(f"⚠️ Could not remove vector store {vector_path}: {e}")
+        return False
+
 def get_all_pdfs(uploaded_by: Optional[int] = None) -> List[Dict]:
     """Get all PDFs, optionally filtered by uploader"""
     conn = sqlite3.connect(DB_PATH)
@@ -235,7 +331,7 @@ def get_all_pdfs(uploaded_by: Optional[int] = None) -> List[Dict]:
         cursor.execute("""
             SELECT p.id, p.filename, p.original_name, p.uploaded_by, 
                    p.upload_date, p.file_size, p.num_pages, p.num_chunks, 
-                   p.num_images, p.is_active, u.username
+                   p.num_images, p.is_active, u.username, p.content_hash, p.vector_path
             FROM pdfs p
             JOIN users u ON p.uploaded_by = u.id
             WHERE p.uploaded_by = ? AND p.is_active = 1
@@ -245,7 +341,7 @@ def get_all_pdfs(uploaded_by: Optional[int] = None) -> List[Dict]:
         cursor.execute("""
             SELECT p.id, p.filename, p.original_name, p.uploaded_by, 
                    p.upload_date, p.file_size, p.num_pages, p.num_chunks, 
-                   p.num_images, p.is_active, u.username
+                   p.num_images, p.is_active, u.username, p.content_hash, p.vector_path
             FROM pdfs p
             JOIN users u ON p.uploaded_by = u.id
             WHERE p.is_active = 1
@@ -267,23 +363,39 @@ def get_all_pdfs(uploaded_by: Optional[int] = None) -> List[Dict]:
             "num_chunks": p[7],
             "num_images": p[8],
             "is_active": p[9],
-            "uploader_name": p[10]
+            "uploader_name": p[10],
+            "content_hash": p[11],
+            "vector_path": p[12] or default_vector_path(p[1])
         }
         for p in pdfs
     ]
 
 def delete_pdf(pdf_id: int) -> bool:
-    """Soft delete a PDF"""
+    """Soft delete a PDF, remove its vectors from the global index and release its vector store"""
     try:
         conn = sqlite3.connect(DB_PATH)
         cursor = conn.cursor()
+        cursor.execute("SELECT filename, vector_path FROM pdfs WHERE id = ?", (pdf_id,))
+        row = cursor.fetchone()
         cursor.execute("UPDATE pdfs SET is_active = 0 WHERE id = ?", (pdf_id,))
         conn.commit()
         conn.close()
-        return True
     except:
         return False
 
+    try:
+        # Imported lazily so the database layer does not depend on FAISS
+        from core.global_index import remove_pdf_from_global_index
+        remove_pdf_from_global_index(pdf_id)
+    except Exception as e:
+        print(f"⚠️ Could not remove PDF {pdf_id} from the global index: {e}")
+
+    # The vector store may be shared by other uploads of the same file
+    if row:
+        release_vector_store(row[1] or default_vector_path(row[0]))
+
+    return True
+
 # ============================================
 # CHAT HISTORY
 # ============================================
@@ -301,6 +413,34 @@ def log_chat(user_id: int, pdf_id: Optional[int], question: str, answer: str):
     conn.commit()
     conn.close()
 
+def get_top_queried_pdfs(limit: int = 5) -> List[Dict]:
+    """Get the active PDFs with the most chat questions, most queried first"""
+    conn = sqlite3.connect(DB_PATH)
+    cursor = conn.cursor()
+    
+    cursor.execute("""
+        SELECT p.id, p.filename, p.vector_path, COUNT(ch.id) AS questions
+        FROM chat_history ch
+        JOIN pdfs p ON ch.pdf_id = p.id
+        WHERE p.is_active = 1
+        GROUP BY p.id
+        ORDER BY questions DESC
+        LIMIT ?
+    """, (limit,))
+    
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [
+        {
+            "id": r[0],
+            "filename": r[1],
+            "vector_path": r[2] or default_vector_path(r[1]),
+            "questions": r[3]
+        }
+        for r in rows
+    ]
+
 def get_chat_history(user_id: Optional[int] = None, limit: int = 100) -> List[Dict]:
     """Get chat history"""
     conn = sqlite3.connect(DB_PATH)
@@ -0,0 +1,133 @@
+import os
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# Redundancy control for the chunks sent to the LLM:
+#   "dedup" drops chunks that are near-duplicates of a higher-ranked chunk,
+#   "mmr" picks top_k from a deeper candidate list by maximal marginal relevance,
+#   "off" keeps the ranking as is
+DIVERSITY_MODE = os.getenv("DIVERSITY_MODE", "dedup")
+
+# Cosine similarity at or above which two chunks count as near-duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.9"))
+
+# MMR trade-off between relevance (1.0) and novelty (0.0)
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+
+# MMR chooses top_k out of this many times top_k candidates
+MMR_CANDIDATE_FACTOR = int(os.getenv("MMR_CANDIDATE_FACTOR", "3"))
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {"mode": DIVERSITY_MODE, "questions": 0, "chunks_removed": 0, "chars_saved": 0}
+
+
+def candidate_pool_size(top_k: int, mode: Optional[str] = None) -> int:
+    """Number of candidates the selection step needs to pick top_k from."""
+    return top_k * MMR_CANDIDATE_FACTOR if (mode or DIVERSITY_MODE) == "mmr" else top_k
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype="float32")
+    return vectors / np.clip(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12, None)
+
+
+def dedup_select(vectors: np.ndarray, top_k: int, threshold: float = DEDUP_THRESHOLD) -> List[int]:
+    """
+    Keeps candidates in rank order, skipping any whose cosine similarity to an
+    already kept candidate reaches threshold. Returns the kept positions.
+    """
+    if len(vectors) == 0:
+        return []
+    unit = _normalize(vectors)
+    similarity = unit @ unit.T
+
+    kept = np.zeros(len(unit), dtype=bool)
+    for i in range(len(unit)):
+        if kept.sum() >= top_k:
+            break
+        if not (similarity[i, kept] >= threshold).any():
+            kept[i] = True
+    return np.flatnonzero(kept).tolist()
+
+
+def mmr_select(
+    query_vector: np.ndarray,
+    vectors: np.ndarray,
+    top_k: int,
+    lambda_: float = MMR_LAMBDA
+) -> List[int]:
+    """
+    Maximal marginal relevance: greedily picks the candidate with the best
+    lambda * sim(query) - (1 - lambda) * max sim(selected). Returns positions in pick order.
+    """
+    if len(vectors) == 0:
+        return []
+    unit = _normalize(vectors)
+    relevance = unit @ _normalize(query_vector).ravel()
+    similarity = unit @ unit.T
+
+    selected = [int(np.argmax(relevance))]
+    # Highest similarity of each candidate to anything selected so far
+    redundancy = similarity[selected[0]].copy()
+    available = np.ones(len(unit), dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(top_k, len(unit)):
+        scores = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        np.maximum(redundancy, similarity[best], out=redundancy)
+    return selected
+
+
+def select_diverse(
+    query_vector: np.ndarray,
+    results: List[Dict[str, Any]],
+    vectors: Optional[np.ndarray],
+    top_k: int,
+    mode: Optional[str] = None
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Removes redundant chunks from ranked results.
+
+    Args:
+        query_vector: Embedding of the question
+        results: Ranked candidates (top_k, or candidate_pool_size(top_k) for MMR)
+        vectors: Stored vectors of the candidates, row i for results[i] (None skips the step)
+        top_k: Number of chunks to keep at most
+
+    Returns:
+        The selected results and {"removed", "chars_saved"} compared with sending results[:top_k]
+    """
+    mode = mode or DIVERSITY_MODE
+    baseline = results[:top_k]
+    if mode == "off" or vectors is None or len(results) <= 1:
+        return baseline, {"removed": 0, "chars_saved": 0}
+
+    if mode == "mmr":
+        positions = mmr_select(query_vector, vectors, top_k)
+    elif mode == "dedup":
+        positions = dedup_select(vectors[:top_k], top_k)
+    else:
+        raise ValueError(f"Unknown diversity mode: {mode}")
+
+    selected = [results[i] for i in positions]
+    chars_saved = sum(len(r["text"]) for r in baseline) - sum(len(r["text"]) for r in selected)
+    removed = len(set(range(len(baseline))) - set(positions))
+
+    with _stats_lock:
+        _stats["questions"] += 1
+        _stats["chunks_removed"] += removed
+        _stats["chars_saved"] += chars_saved
+
+    return selected, {"removed": removed, "chars_saved": chars_saved}
+
+
+def get_diversity_stats() -> Dict[str, Any]:
+    """Returns how many chunks and prompt characters redundancy control saved."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_chars_saved"] = stats["chars_saved"] / stats["questions"] if stats["questions"] else 0.0
+    return stats
@@ -0,0 +1,152 @@
+import os
+import inspect
+import numpy as np
+from typing import Any, Dict, List
+
+from core.compute_scheduler import COMPUTE_THREADS
+
+# Directory holding exported ONNX models (one sub-directory per model)
+ONNX_MODEL_DIR = os.getenv("ONNX_MODEL_DIR", "data/models")
+
+# Matches the max_seq_length of all-MiniLM-L6-v2
+ONNX_MAX_SEQ_LENGTH = int(os.getenv("ONNX_MAX_SEQ_LENGTH", "256"))
+
+
+class TorchBackend:
+    """Default backend: the SentenceTransformer PyTorch model."""
+
+    name = "torch"
+
+    def __init__(self, source: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(source)
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        return np.asarray(
+            self.model.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar),
+            dtype="float32"
+        )
+
+
+class OnnxBackend:
+    """
+    ONNX Runtime backend with a dynamically int8-quantized copy of the model.
+
+    The model is exported and quantized once (this step needs PyTorch and
+    sentence-transformers); afterwards only onnxruntime and the tokenizer are
+    loaded. Mean pooling and L2 normalization reproduce the
+    SentenceTransformer pipeline of MiniLM.
+    """
+
+    name = "onnx"
+
+    def __init__(self, source: str, model_dir: str = ""):
+        try:
+            import onnxruntime as ort  # type: ignore
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_BACKEND=onnx requires: pip install onnxruntime onnx") from e
+
+        self.model_dir = model_dir or os.path.join(ONNX_MODEL_DIR, os.path.basename(source.rstrip("/")) + "-onnx")
+        quantized_path = os.path.join(self.model_dir, "model_int8.onnx")
+        if not os.path.exists(quantized_path):
+            export_onnx_model(source, self.model_dir)
+
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # ONNX Runtime sizes its pool per session, so it gets the app's whole compute budget
+        options.intra_op_num_threads = COMPUTE_THREADS
+        self.session = ort.InferenceSession(quantized_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+
+        # Sort by length so each batch pads to a similar size
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        embeddings: List[np.ndarray] = [np.empty(0)] * len(texts)
+
+        for start in range(0, len(texts), batch_size):
+            batch_ids = order[start:start + batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in batch_ids],
+                padding=True,
+                truncation=True,
+                max_length=ONNX_MAX_SEQ_LENGTH,
+                return_tensors="np"
+            )
+            inputs = {k: v.astype("int64") for k, v in encoded.items() if k in self.input_names}
+            token_embeddings = self.session.run(None, inputs)[0]
+
+            # Mean pooling over real tokens, then L2 normalization
+            mask = encoded["attention_mask"][..., None].astype("float32")
+            pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+            for row, i in enumerate(batch_ids):
+                embeddings[i] = pooled[row]
+
+        return np.vstack(embeddings).astype("float32")
+
+
+def export_onnx_model(source: str, model_dir: str) -> str:
+    """
+    Exports the transformer of a SentenceTransformer to ONNX and quantizes it to int8.
+
+    Returns the path of the quantized model.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from onnxruntime.quantization import QuantType, quantize_dynamic  # type: ignore
+
+    print(f"📦 Exporting '{source}' to ONNX in {model_dir}")
+    os.makedirs(model_dir, exist_ok=True)
+
+    st_model = SentenceTransformer(source, device="cpu")
+    transformer = st_model[0].auto_model.eval()
+    tokenizer = st_model.tokenizer
+    tokenizer.save_pretrained(model_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    # Newer PyTorch defaults to the dynamo exporter, which needs extra packages
+    export_kwargs: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        export_kwargs["dynamo"] = False
+
+    fp32_path = os.path.join(model_dir, "model.onnx")
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer,
+            tuple(sample[name] for name in input_names),
+            fp32_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=14,
+            **export_kwargs
+        )
+
+    quantized_path = os.path.join(model_dir, "model_int8.onnx")
+    quantize_dynamic(fp32_path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"✅ Quantized model saved to {quantized_path}")
+    return quantized_path
+
+
+BACKENDS = {
+    "torch": TorchBackend,
+    "onnx": OnnxBackend
+}
+
+
+def load_backend(name: str, source: str) -> Any:
+    """Creates the embedding backend called name for the given model name or path."""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend: {name} (expected one of {', '.join(BACKENDS)})")
+    return BACKENDS[name](source)
@@ -0,0 +1,181 @@
+import os
+import queue
+import threading
+import time
+import numpy as np
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Route query encoding through the shared micro-batching worker
+EMBEDDING_MICROBATCH = os.getenv("EMBEDDING_MICROBATCH", "1") == "1"
+
+# A batch is flushed once it holds this many texts or its first request has
+# waited this long, whichever comes first
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_MAX_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_MAX_WAIT_MS", "5"))
+
+
+class Histogram:
+    """Counts observations in fixed buckets (upper bounds, plus an overflow bucket)."""
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = list(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        bucket = len(self.bounds)
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                bucket = i
+                break
+        self.counts[bucket] += 1
+        self.total += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+            "buckets": dict(zip(labels, self.counts))
+        }
+
+
+class EmbeddingService:
+    """
+    Coalesces encode requests from all sessions into micro-batches.
+
+    Callers submit texts and get a Future; one worker thread drains the queue,
+    runs a single forward pass per batch and resolves every Future of the batch
+    with its rows.
+    """
+
+    def __init__(
+        self,
+        encode_batch: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        max_wait_ms: float = EMBEDDING_BATCH_MAX_WAIT_MS
+    ):
+        self.encode_batch = encode_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[List[str], Future, float]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.queue_depth = Histogram([0, 1, 2, 4, 8, 16, 32, 64])
+        self.batch_size = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.wait_ms = Histogram([1, 2, 5, 10, 20, 50, 100, 500])
+
+    def submit(self, texts: List[str]) -> "Future[np.ndarray]":
+        """Queues texts for encoding. The Future resolves to an (n, dim) float32 matrix."""
+        future: "Future[np.ndarray]" = Future()
+        if not texts:
+            future.set_result(np.zeros((0, 0), dtype="float32"))
+            return future
+
+        self._ensure_worker()
+        with self._stats_lock:
+            self.requests += 1
+            self.queue_depth.observe(self._queue.qsize())
+        self._queue.put((list(texts), future, time.perf_counter()))
+        return future
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Blocking helper: submits texts and waits for their embeddings."""
+        return self.submit(texts).result()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns request counts and queue depth, batch size and wait-time histograms."""
+        with self._stats_lock:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "queued": self._queue.qsize(),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0,
+                "queue_depth": self.queue_depth.snapshot(),
+                "batch_size": self.batch_size.snapshot(),
+                "wait_ms": self.wait_ms.snapshot()
+            }
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._start_lock:
+            # A worker that died is replaced, so queued requests are never stranded
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-service", daemon=True)
+                self._worker.start()
+
+    def _next(self, timeout: Optional[float] = None) -> Tuple[List[str], Future, float]:
+        """Returns the next request whose caller is still waiting; cancelled ones are dropped."""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        while True:
+            if deadline is None:
+                item = self._queue.get()
+            else:
+                remaining = deadline - time.perf_counter()
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            # Marks the Future running, after which a caller can no longer cancel it
+            if item[1].set_running_or_notify_cancel():
+                return item
+
+    def _collect(self) -> List[Tuple[List[str], Future, float]]:
+        """Blocks for the first request, then gathers more until the batch is full or the deadline passes."""
+        batch = [self._next()]
+        size = len(batch[0][0])
+        deadline = batch[0][2] + self.max_wait
+
+        while size < self.max_batch_size:
+            try:
+                item = self._next(timeout=deadline - time.perf_counter())
+            except queue.Empty:
+                break
+            batch.append(item)
+            size += len(item[0])
+
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Tuple[List[str], Future, float]] = []
+            try:
+                batch = self._collect()
+                self._encode(batch)
+            except Exception as e:
+                # Nothing may kill the only worker; fail this batch and keep serving
+                print(f"⚠️ Embedding service batch failed: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _encode(self, batch: List[Tuple[List[str], Future, float]]) -> None:
+        started = time.perf_counter()
+        texts = [text for item in batch for text in item[0]]
+
+        with self._stats_lock:
+            self.batches += 1
+            self.batch_size.observe(len(texts))
+            for _, _, queued_at in batch:
+                self.wait_ms.observe((started - queued_at) * 1000.0)
+
+        try:
+            embeddings = np.asarray(self.encode_batch(texts), dtype="float32")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        offset = 0
+        for item_texts, future, _ in batch:
+            future.set_result(embeddings[offset:offset + len(item_texts)])
+            offset += len(item_texts)
@@ -1,22 +1,339 @@
 import os
+import json
+import mmap
 import pickle
+import threading
+import time
 import faiss  # type: ignore
 import numpy as np
-from typing import List, Dict, Any, Tuple
-from sentence_transformers import SentenceTransformer
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+from core.embedding_backends import load_backend
+from core.compute_scheduler import compute_scheduler
+from core.embedding_service import EMBEDDING_BATCH_MAX_SIZE, EMBEDDING_MICROBATCH, EmbeddingService
+from core.index_factory import RerankIndex, build_index, configure_search, rerank_index
+from core.lexical_index import LexicalIndex, reciprocal_rank_fusion
+from core.query_cache import query_cache
 
-# Initialize the model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+# Embedding model; EMBEDDING_MODEL_PATH points at a local copy for fully offline startup
+EMBEDDING_MODEL_NAME = os.getenv("EMBEDDING_MODEL_NAME", "all-MiniLM-L6-v2")
+EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "")
 
-def create_vector_store(documents: List[Dict[str, Any]], save_path: str) -> Tuple[Any, List[Dict[str, Any]]]:
+# Inference backend: "torch" (SentenceTransformer) or "onnx" (int8 ONNX Runtime)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+
+# Persisted query embeddings are only valid for the backend and model that made them
+query_cache.namespace = f"{EMBEDDING_BACKEND}:{EMBEDDING_MODEL_PATH or EMBEDDING_MODEL_NAME}"
+
+# The model is loaded on first use (or by warm_up_model) and shared by all sessions
+_model: Any = None
+_model_lock = threading.Lock()
+_model_stats: Dict[str, Any] = {"loaded": False, "backend": EMBEDDING_BACKEND, "source": None, "load_seconds": None}
+
+
+def get_model() -> Any:
     """
-    Creates a FAISS index from document chunks and saves it along with metadata.
+    Returns the shared embedding backend, loading it on first call.
+
+    Thread-safe: concurrent first callers wait for a single load.
     """
-    if not documents:
-        raise ValueError("No documents provided for vector store creation")
-    
-    texts: List[str] = [d["text"] for d in documents]
-    metadata: List[Dict[str, Any]] = [
+    global _model
+    if _model is None:
+        with _model_lock:
+            if _model is None:
+                source = EMBEDDING_MODEL_PATH or EMBEDDING_MODEL_NAME
+
+                start = time.perf_counter()
+                loaded_model = load_backend(EMBEDDING_BACKEND, source)
+                elapsed = time.perf_counter() - start
+
+                _model_stats.update({"loaded": True, "source": source, "load_seconds": elapsed})
+                print(f"✅ Embedding model '{source}' ({EMBEDDING_BACKEND}) ready in {elapsed:.2f}s")
+                _model = loaded_model
+    return _model
+
+
+def warm_up_model(background: bool = False) -> Optional[threading.Thread]:
+    """
+    Loads the embedding model ahead of the first question.
+
+    With background=True the load runs in a daemon thread, which is returned.
+    """
+    def _warm_up() -> None:
+        try:
+            get_model().encode(["warm up"])
+        except Exception as e:
+            print(f"⚠️ Embedding model warm-up failed: {e}")
+
+    if not background:
+        _warm_up()
+        return None
+
+    thread = threading.Thread(target=_warm_up, name="embedding-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_model_stats() -> Dict[str, Any]:
+    """Returns whether the model is loaded and how long startup took."""
+    return dict(_model_stats)
+
+
+# Shared worker that coalesces query encodes from concurrent sessions into micro-batches
+embedding_service = EmbeddingService(lambda texts: _encode_interactive(texts, EMBEDDING_BATCH_MAX_SIZE))
+
+
+def get_embedding_service_stats() -> Dict[str, Any]:
+    """Returns queue depth, batch size and wait-time histograms of the embedding service."""
+    return {"enabled": EMBEDDING_MICROBATCH, **embedding_service.stats()}
+
+
+def _encode_texts(texts: List[str], batch_size: int = 32) -> np.ndarray:
+    """Encodes query texts, through the micro-batching service when it is enabled."""
+    if EMBEDDING_MICROBATCH:
+        return embedding_service.encode(texts)
+    return _encode_interactive(texts, batch_size)
+
+
+def _encode_interactive(texts: List[str], batch_size: int) -> np.ndarray:
+    with compute_scheduler.interactive():
+        return get_model().encode(texts, batch_size=batch_size)
+
+
+def encode_documents(texts: List[str], show_progress_bar: bool = True) -> np.ndarray:
+    """Encodes document chunks within the background ingestion thread budget."""
+    with compute_scheduler.ingestion():
+        return get_model().encode(texts, show_progress_bar=show_progress_bar)
+
+
+def __getattr__(name: str) -> Any:
+    # Backwards compatibility for code that used the module-level `model`
+    if name == "model":
+        return get_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Storage mode for new vector stores: "heap" (index read into private memory) or
+# "mmap" (vectors memory-mapped from disk so that sessions and worker processes
+# share the page cache). Chunk metadata is memory-mapped in both modes.
+VECTOR_STORAGE_MODE = os.getenv("VECTOR_STORAGE_MODE", "heap")
+
+CONFIG_FILE = "index_config.json"
+
+# Columnar chunk metadata, memory-mapped in every storage mode
+METADATA_FILES = {
+    "pages": "meta_pages.npy",
+    "has_images": "meta_has_images.npy",
+    "text": "meta_text.bin",
+    "text_offsets": "meta_text_offsets.npy"
+}
+
+# Pickled metadata of stores written before the columnar layout (still readable)
+LEGACY_METADATA_FILE = "metadata.pkl"
+
+# Page content hash of every chunk, aligned with the metadata
+PAGE_HASHES_FILE = "page_hashes.json"
+
+# Retrieval mode: "dense" (MiniLM only) or "hybrid" (BM25 and dense rankings
+# fused with reciprocal rank fusion, so exact codes and part numbers are found)
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+
+# Each ranking contributes this many times top_k candidates to the fusion
+HYBRID_CANDIDATE_FACTOR = int(os.getenv("HYBRID_CANDIDATE_FACTOR", "4"))
+
+# BM25 hits scoring below this fraction of the best hit are left out of the
+# fusion; rank fusion ignores scores, so a chunk matching only a near-zero-idf
+# piece of a code (the "err" of "ERR-4021") would otherwise count as much as
+# the chunk matching the whole code
+HYBRID_MIN_LEXICAL_RATIO = float(os.getenv("HYBRID_MIN_LEXICAL_RATIO", "0.5"))
+
+# The BM25 ranking is only fused when its best score is at least this many
+# times the score at the candidate depth; natural-language questions score
+# almost flat over common words, and fusing that noise pushes out the dense hits
+HYBRID_MIN_LEXICAL_GAP = float(os.getenv("HYBRID_MIN_LEXICAL_GAP", "2.0"))
+
+
+class MmapFlatIndex:
+    """
+    Exact L2 index over a memory-mapped float32 matrix.
+
+    Mirrors the parts of the faiss.IndexFlatL2 API used by the app, but never
+    copies the vectors into private memory.
+    """
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.ntotal, self.d = vectors.shape
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        return faiss.knn(queries, self.vectors, k)
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.vectors[key])
+
+
+class ColumnarMetadata(Sequence[Dict[str, Any]]):
+    """
+    Read-only list of chunk metadata stored column by column.
+
+    Page numbers and has_images flags are typed arrays, chunk texts one UTF-8
+    blob with an int64 offsets array. Everything is memory-mapped, so opening
+    a store reads nothing and a search decodes only its top-k rows.
+    """
+
+    def __init__(self, path: str):
+        self.pages = np.load(os.path.join(path, METADATA_FILES["pages"]), mmap_mode="r")
+        self.has_images = np.load(os.path.join(path, METADATA_FILES["has_images"]), mmap_mode="r")
+        self._offsets = np.load(os.path.join(path, METADATA_FILES["text_offsets"]), mmap_mode="r")
+        self._file = open(os.path.join(path, METADATA_FILES["text"]), "rb")
+        # mmap cannot map an empty file
+        self._text = (
+            mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self._offsets[-1] else b""
+        )
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def text(self, idx: int) -> str:
+        start, end = int(self._offsets[idx]), int(self._offsets[idx + 1])
+        return self._text[start:end].decode("utf-8")
+
+    def __getitem__(self, idx):  # type: ignore[override]
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("metadata index out of range")
+        return {
+            "page": int(self.pages[idx]),
+            "text": self.text(idx),
+            "has_images": bool(self.has_images[idx])
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for i in range(len(self)):
+            yield self[i]
+
+
+def _write_columnar_metadata(metadata: List[Dict[str, Any]], save_path: str) -> None:
+    """Writes metadata as typed column arrays plus a UTF-8 text blob with offsets."""
+    np.save(os.path.join(save_path, METADATA_FILES["pages"]), np.array([row["page"] for row in metadata], dtype="int32"))
+    np.save(
+        os.path.join(save_path, METADATA_FILES["has_images"]),
+        np.array([bool(row.get("has_images", False)) for row in metadata], dtype=bool)
+    )
+    offsets = np.zeros(len(metadata) + 1, dtype="int64")
+    with open(os.path.join(save_path, METADATA_FILES["text"]), "wb") as f:
+        for i, row in enumerate(metadata):
+            data = row["text"].encode("utf-8")
+            f.write(data)
+            offsets[i + 1] = offsets[i] + len(data)
+    np.save(os.path.join(save_path, METADATA_FILES["text_offsets"]), offsets)
+
+    # The pickle of an older generation of this store would otherwise linger
+    legacy_path = os.path.join(save_path, LEGACY_METADATA_FILE)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+
+def load_metadata(path: str) -> Sequence[Dict[str, Any]]:
+    """Opens columnar metadata, falling back to the metadata.pkl of older stores."""
+    if os.path.exists(os.path.join(path, METADATA_FILES["text_offsets"])):
+        return ColumnarMetadata(path)
+
+    pickle_path = os.path.join(path, LEGACY_METADATA_FILE)
+    if os.path.exists(pickle_path):
+        with open(pickle_path, "rb") as f:
+            return pickle.load(f)
+
+    raise FileNotFoundError(f"Metadata not found at {path}")
+
+
+def read_index_config(path: str) -> Dict[str, Any]:
+    """Reads the index configuration saved next to a vector store (empty if absent)."""
+    config_path = os.path.join(path, CONFIG_FILE)
+    if not os.path.exists(config_path):
+        return {}
+    with open(config_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_vector_store(
+    embeddings: np.ndarray,
+    metadata: List[Dict[str, Any]],
+    save_path: str,
+    storage: Optional[str] = None,
+    index_type: Optional[str] = None,
+    compression: Optional[str] = None,
+    pca_dim: Optional[int] = None
+) -> Any:
+    """
+    Builds a FAISS index from precomputed embeddings and saves it with its metadata.
+
+    The index type defaults to VECTOR_INDEX_TYPE ("auto" picks flat, HNSW or
+    IVF-Flat from the number of vectors), the compression to
+    VECTOR_COMPRESSION and the PCA dimension to VECTOR_PCA_DIM; all are
+    recorded in index_config.json.
+    """
+    storage = storage or VECTOR_STORAGE_MODE
+    if storage not in ("heap", "mmap"):
+        raise ValueError(f"Unknown storage mode: {storage}")
+
+    embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    with compute_scheduler.ingestion():
+        index, index_config = build_index(
+            embeddings, index_type=index_type, compression=compression, pca_dim=pca_dim
+        )
+    faiss_index = index.index if isinstance(index, RerankIndex) else index
+
+    # Ensure the storage directory exists
+    os.makedirs(save_path, exist_ok=True)
+
+    config: Dict[str, Any] = {
+        "storage": storage,
+        "dimension": int(embeddings.shape[1]),
+        "ntotal": int(index.ntotal),
+        **index_config
+    }
+
+    exact_flat = (
+        index_config["index_type"] == "flat"
+        and index_config["compression"] == "none"
+        and not index_config.get("pca_dim")
+    )
+
+    if storage == "mmap" and exact_flat:
+        # Flat vectors are searched straight from the mapped .npy file
+        stale_index = os.path.join(save_path, "index.faiss")
+        if os.path.exists(stale_index):
+            os.remove(stale_index)
+    elif index_config["compression"] == "binary":
+        faiss.write_index_binary(faiss_index, os.path.join(save_path, "index.faiss"))
+    else:
+        faiss.write_index(faiss_index, os.path.join(save_path, "index.faiss"))
+
+    if storage == "mmap" and exact_flat:
+        # Full-precision vectors, memory-mapped at load time
+        np.save(os.path.join(save_path, "vectors.npy"), embeddings)
+    elif index_config.get("rerank"):
+        # Half precision is enough to re-rank candidates and keeps the
+        # compressed store smaller on disk than an uncompressed one
+        np.save(os.path.join(save_path, "vectors.npy"), embeddings.astype("float16"))
+
+    _write_columnar_metadata(metadata, save_path)
+
+    # BM25 postings for hybrid retrieval
+    LexicalIndex.build(row["text"] for row in metadata).save(save_path)
+
+    with open(os.path.join(save_path, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+    return index
+
+
+def documents_metadata(documents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [
         {
             "page": d["page"], 
             "text": d["text"],
@@ -25,75 +342,444 @@ def create_vector_store(documents: List[Dict[str, Any]], save_path: str) -> Tupl
         for d in documents
     ]
 
-    # Encode texts into embeddings
-    embeddings = model.encode(texts, show_progress_bar=True).astype("float32")
 
-    # Initialize FAISS index with L2 distance
-    dimension = embeddings.shape[1]
-    index: faiss.IndexFlatL2 = faiss.IndexFlatL2(dimension)
-    index.add(embeddings)
+def write_page_hashes(documents: List[Dict[str, Any]], save_path: str) -> None:
+    """Saves the page content hash of every chunk, used to reuse vectors on re-index."""
+    if all("page_hash" in d for d in documents):
+        with open(os.path.join(save_path, PAGE_HASHES_FILE), "w", encoding="utf-8") as f:
+            json.dump([d["page_hash"] for d in documents], f)
 
-    # Ensure the storage directory exists
-    os.makedirs(save_path, exist_ok=True)
 
-    # Save the FAISS index and metadata
-    faiss.write_index(index, os.path.join(save_path, "index.faiss"))
-    with open(os.path.join(save_path, "metadata.pkl"), "wb") as f:
-        pickle.dump(metadata, f)
+def create_vector_store(
+    documents: List[Dict[str, Any]],
+    save_path: str,
+    storage: Optional[str] = None,
+    index_type: Optional[str] = None,
+    compression: Optional[str] = None,
+    pca_dim: Optional[int] = None
+) -> Tuple[Any, List[Dict[str, Any]]]:
+    """
+    Creates a FAISS index from document chunks and saves it along with metadata.
+    """
+    if not documents:
+        raise ValueError("No documents provided for vector store creation")
+    
+    texts: List[str] = [d["text"] for d in documents]
+    metadata = documents_metadata(documents)
+
+    # Encode texts into embeddings
+    embeddings = encode_documents(texts)
+
+    index = save_vector_store(
+        embeddings, metadata, save_path,
+        storage=storage, index_type=index_type, compression=compression, pca_dim=pca_dim
+    )
+    write_page_hashes(documents, save_path)
 
     return index, metadata
 
 
-def load_vector_store(path: str) -> Tuple[Any, List[Dict[str, Any]]]:
+def stored_vectors(index: Any, path: str) -> np.ndarray:
+    """
+    Returns the full vectors of a vector store (from vectors.npy or the index itself).
+
+    PCA-reduced indices map their vectors back to the model's dimension, which
+    is only an approximation of the original embeddings.
+    """
+    vectors_path = os.path.join(path, "vectors.npy")
+    if os.path.exists(vectors_path):
+        vectors = np.load(vectors_path, mmap_mode="r")
+        # Re-rank vectors are stored in half precision
+        return vectors if vectors.dtype == np.float32 else vectors.astype("float32")
+
+    if read_index_config(path).get("index_type") == "ivf_flat":
+        faiss.extract_index_ivf(index).make_direct_map()
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def reusable_vectors(previous_path: str) -> Tuple[Dict[str, List[int]], Sequence[Dict[str, Any]], np.ndarray]:
+    """
+    Maps page hash -> chunk positions of a previous store, with its metadata and exact vectors.
+
+    Stores whose vectors cannot be reused map no pages (and return an empty matrix).
+    """
+    nothing: Tuple[Dict[str, List[int]], Sequence[Dict[str, Any]], np.ndarray] = (
+        {}, [], np.zeros((0, 0), dtype="float32")
+    )
+    hashes_path = os.path.join(previous_path, PAGE_HASHES_FILE)
+    config = read_index_config(previous_path)
+    if not os.path.exists(hashes_path):
+        return nothing
+    lossy = config.get("compression", "none") != "none" or config.get("pca_dim")
+    if lossy and not config.get("rerank"):
+        # Compressed or PCA-reduced vectors can only be reconstructed approximately
+        return nothing
+
+    with open(hashes_path, "r", encoding="utf-8") as f:
+        hashes = json.load(f)
+    index, metadata = load_vector_store(previous_path)
+
+    by_hash: Dict[str, List[int]] = {}
+    for pos, h in enumerate(hashes):
+        by_hash.setdefault(h, []).append(pos)
+    return by_hash, metadata, stored_vectors(index, previous_path)
+
+
+def reused_positions(
+    chunks: List[Dict[str, Any]],
+    by_hash: Dict[str, List[int]],
+    previous_metadata: Sequence[Dict[str, Any]]
+) -> Optional[List[int]]:
+    """
+    Positions in the previous store whose vectors the chunks of one page can reuse.
+
+    A page is reused only as a whole: its content hash must match a previous
+    page with as many chunks and identical chunk texts. Returns None when the
+    page has to be embedded.
+    """
+    h = chunks[0].get("page_hash") if chunks else None
+    old_positions = by_hash.get(h) if h else None
+    if not old_positions or len(old_positions) != len(chunks):
+        return None
+    if any(previous_metadata[o]["text"] != c["text"] for o, c in zip(old_positions, chunks)):
+        return None
+    return old_positions
+
+
+def sample_seconds_per_chunk(texts: List[str], sample_size: int = 32) -> float:
+    """Embedding time per chunk, measured on the first sample_size texts."""
+    sample = texts[:sample_size]
+    if not sample:
+        return 0.0
+    start = time.perf_counter()
+    with compute_scheduler.ingestion():
+        get_model().encode(sample)
+    return (time.perf_counter() - start) / len(sample)
+
+
+def update_vector_store(
+    documents: List[Dict[str, Any]],
+    save_path: str,
+    previous_path: str,
+    storage: Optional[str] = None,
+    index_type: Optional[str] = None,
+    compression: Optional[str] = None,
+    pca_dim: Optional[int] = None
+) -> Tuple[Any, List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Builds a new vector store generation for a revised PDF.
+
+    Chunks of pages whose content hash matches a page of the previous store
+    reuse its vectors; only changed or new pages are embedded. The merged set
+    is indexed from scratch into save_path.
+
+    Returns:
+        The index, the metadata and a report with reused/embedded counts and
+        the embedding time saved against a full rebuild
+    """
+    if not documents:
+        raise ValueError("No documents provided for vector store creation")
+
+    start = time.perf_counter()
+    by_hash, previous_metadata, previous_vectors = reusable_vectors(previous_path)
+
+    # Group the new chunks by page so a page is reused only as a whole
+    pages: Dict[Tuple[int, str], List[int]] = {}
+    for pos, d in enumerate(documents):
+        pages.setdefault((d["page"], d.get("page_hash", "")), []).append(pos)
+
+    reused: Dict[int, int] = {}
+    reused_pages = 0
+    for positions in pages.values():
+        old_positions = reused_positions([documents[n] for n in positions], by_hash, previous_metadata)
+        if old_positions is None:
+            continue
+        reused.update(zip(positions, old_positions))
+        reused_pages += 1
+
+    missing = [pos for pos in range(len(documents)) if pos not in reused]
+    embed_start = time.perf_counter()
+    new_vectors = np.zeros((0, 0), dtype="float32")
+    if missing:
+        new_vectors = encode_documents([documents[pos]["text"] for pos in missing])
+    embed_seconds = time.perf_counter() - embed_start
+
+    dimension = new_vectors.shape[1] if missing else previous_vectors.shape[1]
+    embeddings = np.empty((len(documents), dimension), dtype="float32")
+    if reused:
+        new_pos = np.fromiter(reused.keys(), dtype="int64")
+        old_pos = np.fromiter(reused.values(), dtype="int64")
+        embeddings[new_pos] = previous_vectors[old_pos]
+    if missing:
+        embeddings[missing] = new_vectors
+
+    # Embedding rate for the time-saved estimate (sampled when nothing had to be embedded)
+    if missing:
+        seconds_per_chunk = embed_seconds / len(missing)
+    else:
+        seconds_per_chunk = sample_seconds_per_chunk([documents[pos]["text"] for pos in reused])
+
+    metadata = documents_metadata(documents)
+    index = save_vector_store(
+        embeddings, metadata, save_path,
+        storage=storage, index_type=index_type, compression=compression, pca_dim=pca_dim
+    )
+    write_page_hashes(documents, save_path)
+
+    report = {
+        "chunks": len(documents),
+        "reused_chunks": len(reused),
+        "embedded_chunks": len(missing),
+        "reused_pages": reused_pages,
+        "changed_pages": len(pages) - reused_pages,
+        "embed_seconds": embed_seconds,
+        "total_seconds": time.perf_counter() - start,
+        "seconds_saved": seconds_per_chunk * len(reused)
+    }
+    print(
+        f"♻️  Re-index: reused {report['reused_chunks']}/{report['chunks']} chunks "
+        f"({report['reused_pages']} unchanged pages), saved ~{report['seconds_saved']:.1f}s of embedding"
+    )
+    return index, metadata, report
+
+
+def load_vector_store(path: str) -> Tuple[Any, Sequence[Dict[str, Any]]]:
     """
     Loads an existing FAISS index and its associated metadata from disk.
+
+    Stores saved in "mmap" mode are memory-mapped instead of read into memory,
+    and ANN search parameters are restored from index_config.json.
     """
+    config = read_index_config(path)
+    if config.get("storage") == "mmap":
+        index, metadata = _load_mmap_vector_store(path, config)
+        configure_search(index, config)
+        return _with_rerank(index, path, config), metadata
+
     index_path = os.path.join(path, "index.faiss")
-    metadata_path = os.path.join(path, "metadata.pkl")
 
     if not os.path.exists(index_path):
         raise FileNotFoundError(f"FAISS index not found at {index_path}")
-    
-    if not os.path.exists(metadata_path):
-        raise FileNotFoundError(f"Metadata not found at {metadata_path}")
 
     try:
-        index = faiss.read_index(index_path)
-        with open(metadata_path, "rb") as f:
-            metadata = pickle.load(f)
+        if config.get("compression") == "binary":
+            index = faiss.read_index_binary(index_path)
+        else:
+            index = faiss.read_index(index_path)
+        metadata = load_metadata(path)
+    except FileNotFoundError:
+        raise
     except Exception as e:
         raise Exception(f"Failed to load vector store: {str(e)}")
+
+    configure_search(index, config)
         
+    return _with_rerank(index, path, config), metadata
+
+
+def _with_rerank(index: Any, path: str, config: Dict[str, Any]) -> Any:
+    """Wraps compressed indices so candidates are re-ranked against the mapped full vectors."""
+    if not config.get("rerank"):
+        return index
+    vectors_path = os.path.join(path, "vectors.npy")
+    if not os.path.exists(vectors_path):
+        raise FileNotFoundError(f"Re-rank vectors not found at {vectors_path}")
+    return rerank_index(index, np.load(vectors_path, mmap_mode="r"), config)
+
+
+def _load_mmap_vector_store(path: str, config: Dict[str, Any]) -> Tuple[Any, Sequence[Dict[str, Any]]]:
+    index_path = os.path.join(path, "index.faiss")
+    vectors_path = os.path.join(path, "vectors.npy")
+
+    if not os.path.exists(index_path) and not os.path.exists(vectors_path):
+        raise FileNotFoundError(f"FAISS index not found at {index_path}")
+
+    try:
+        if config.get("compression") == "binary":
+            # Sign-bit codes are 32x smaller than the mapped vectors they re-rank against
+            index = faiss.read_index_binary(index_path)
+        elif os.path.exists(index_path):
+            # IVF inverted lists are mapped by FAISS itself (HNSW is read normally)
+            index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        else:
+            index = MmapFlatIndex(np.load(vectors_path, mmap_mode="r"))
+        metadata = load_metadata(path)
+    except FileNotFoundError:
+        raise
+    except Exception as e:
+        raise Exception(f"Failed to load vector store: {str(e)}")
+
     return index, metadata
 
 
+def encode_query(query: str) -> np.ndarray:
+    """
+    Encodes a single query into a (1, dim) float32 matrix.
+
+    Repeated questions are served from the shared query embedding cache.
+    """
+    return query_cache.get_or_compute(query, lambda q: _encode_texts([q]))
+
+
+def encode_queries(queries: List[str]) -> np.ndarray:
+    """Encodes several queries in one batched call into an (n, dim) float32 matrix."""
+    return query_cache.get_or_compute_batch(
+        queries, lambda qs: _encode_texts(qs, batch_size=64)
+    )
+
+
+def _to_results(
+    indices: np.ndarray,
+    distances: np.ndarray,
+    metadata: Sequence[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """Turns one row of FAISS search output into result dicts."""
+    results: List[Dict[str, Any]] = []
+    
+    for idx, dist in zip(indices, distances):
+        if idx != -1 and idx < len(metadata):
+            row = metadata[idx]
+            results.append({
+                "page": row["page"],
+                "text": row["text"],
+                "distance": float(dist),
+                "has_images": row.get("has_images", False),
+                "chunk_index": int(idx)
+            })
+
+    return results
+
+
+def result_vectors(index: Any, results: List[Dict[str, Any]]) -> Optional[np.ndarray]:
+    """
+    Returns the stored vectors of search results (row i for results[i]).
+
+    Returns None when the index cannot reconstruct vectors (e.g. IVF without a direct map).
+    """
+    ids = [res["chunk_index"] for res in results]
+    if not ids:
+        return None
+    stored = getattr(index, "vectors", None)
+    try:
+        if stored is not None:
+            # Mapped flat vectors and re-rank vectors can be read directly
+            return np.asarray(stored[np.array(ids)], dtype="float32")
+        return np.vstack([index.reconstruct(int(i)) for i in ids]).astype("float32")
+    except Exception:
+        return None
+
+
+def _fuse_hybrid(
+    query: str,
+    query_embedding: np.ndarray,
+    dense_indices: np.ndarray,
+    dense_distances: np.ndarray,
+    index: Any,
+    metadata: Sequence[Dict[str, Any]],
+    lexical: LexicalIndex,
+    top_k: int
+) -> List[Dict[str, Any]]:
+    """
+    Fuses the dense and BM25 rankings of one query with reciprocal rank fusion.
+
+    Only BM25 hits scoring at least HYBRID_MIN_LEXICAL_RATIO of the best one
+    take part, so weak partial matches cannot outrank strong ones. A BM25
+    ranking without a clear leader (see HYBRID_MIN_LEXICAL_GAP) is left out
+    and the dense ranking is returned as is.
+    """
+    depth = len(dense_indices)
+    lexical_ids, lexical_scores = lexical.search(query, depth)
+    if len(lexical_scores):
+        # Fewer hits than the depth means the query terms are specific
+        floor = lexical_scores[-1] if len(lexical_scores) == depth else 0.0
+        if lexical_scores[0] < floor * HYBRID_MIN_LEXICAL_GAP:
+            return _to_results(dense_indices[:top_k], dense_distances[:top_k], metadata)
+        lexical_ids = lexical_ids[lexical_scores >= lexical_scores[0] * HYBRID_MIN_LEXICAL_RATIO]
+    dense = {int(i): float(d) for i, d in zip(dense_indices, dense_distances) if i != -1}
+    fused = reciprocal_rank_fusion([[int(i) for i in dense_indices if i != -1], lexical_ids.tolist()])[:top_k]
+
+    # Lexical-only hits get their exact distance so confidence stays meaningful
+    fallback = max(dense.values()) if dense else 0.0
+    indices, distances = [], []
+    for idx, _ in fused:
+        dist = dense.get(idx)
+        if dist is None:
+            try:
+                dist = float(((np.asarray(index.reconstruct(idx)) - query_embedding) ** 2).sum())
+            except Exception:
+                dist = fallback
+        indices.append(idx)
+        distances.append(dist)
+
+    results = _to_results(np.array(indices, dtype="int64"), np.array(distances, dtype="float32"), metadata)
+    for res, (_, score) in zip(results, fused):
+        res["rrf_score"] = score
+    return results
+
+
 def similarity_search(
     query: str, 
     index: Any, 
-    metadata: List[Dict[str, Any]], 
-    top_k: int = 5
+    metadata: Sequence[Dict[str, Any]], 
+    top_k: int = 5,
+    lexical: Optional[LexicalIndex] = None,
+    mode: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Converts a query into an embedding and retrieves the top_k most relevant chunks.
+
+    In "hybrid" mode (the RETRIEVAL_MODE default) the dense ranking is fused
+    with the BM25 ranking of lexical; without a lexical index it is dense only.
     """
     if not query.strip():
         return []
     
     # Encode query
-    query_embedding = model.encode([query]).astype("float32")
+    query_embedding = encode_query(query)
+
+    if (mode or RETRIEVAL_MODE) == "hybrid" and lexical is not None:
+        with compute_scheduler.interactive():
+            distances, indices = index.search(query_embedding, top_k * HYBRID_CANDIDATE_FACTOR)
+        return _fuse_hybrid(query, query_embedding[0], indices[0], distances[0], index, metadata, lexical, top_k)
     
     # Search for similar vectors
-    distances, indices = index.search(query_embedding, top_k)
+    with compute_scheduler.interactive():
+        distances, indices = index.search(query_embedding, top_k)
 
-    results: List[Dict[str, Any]] = []
-    
-    for idx, dist in zip(indices[0], distances[0]):
-        if idx != -1 and idx < len(metadata):
-            results.append({
-                "page": metadata[idx]["page"],
-                "text": metadata[idx]["text"],
-                "distance": float(dist),
-                "has_images": metadata[idx].get("has_images", False)
-            })
+    return _to_results(indices[0], distances[0], metadata)
+
+
+def similarity_search_batch(
+    queries: List[str],
+    index: Any,
+    metadata: Sequence[Dict[str, Any]],
+    top_k: int = 5,
+    lexical: Optional[LexicalIndex] = None,
+    mode: Optional[str] = None
+) -> List[List[Dict[str, Any]]]:
+    """
+    Retrieves the top_k chunks for many queries with one encode call and one index search.
+
+    Returns one result list per query, in input order (empty for blank queries).
+    """
+    positions = [i for i, q in enumerate(queries) if q.strip()]
+    results: List[List[Dict[str, Any]]] = [[] for _ in queries]
+    if not positions:
+        return results
+
+    hybrid = (mode or RETRIEVAL_MODE) == "hybrid" and lexical is not None
+
+    query_embeddings = encode_queries([queries[i] for i in positions])
+    with compute_scheduler.interactive():
+        distances, indices = index.search(query_embeddings, top_k * HYBRID_CANDIDATE_FACTOR if hybrid else top_k)
+
+    for row, pos in enumerate(positions):
+        if hybrid and lexical is not None:
+            results[pos] = _fuse_hybrid(
+                queries[pos], query_embeddings[row], indices[row], distances[row],
+                index, metadata, lexical, top_k
+            )
+        else:
+            results[pos] = _to_results(indices[row], distances[row], metadata)
 
-    return results
\ No newline at end of file
+    return results
@@ -0,0 +1,311 @@
+import json
+import os
+import threading
+import faiss  # type: ignore
+import numpy as np
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple
+
+from core.compute_scheduler import compute_scheduler
+from core.embeddings import encode_query, load_metadata, load_vector_store, stored_vectors
+
+GLOBAL_INDEX_PATH = os.getenv("GLOBAL_INDEX_PATH", "data/vectorstore/_global")
+
+
+def make_chunk_id(pdf_id: int, chunk_no: int) -> int:
+    """Chunk ids carry the PDF id in the high 32 bits and the chunk number in the low 32."""
+    return (int(pdf_id) << 32) | int(chunk_no)
+
+
+class GlobalIndex:
+    """
+    One flat index over the chunks of every PDF.
+
+    Positions in the FAISS index are mapped to chunk ids (id_map.npy), so
+    searches can be restricted to any set of PDFs and a PDF's vectors can be
+    removed without rebuilding the index. Chunk texts are not copied: a chunk
+    id's low bits are its row in the PDF's own (memory-mapped) store metadata.
+
+    Uploads of identical files share one vector store, and its vectors are
+    indexed once, under the id of one of those PDFs (the store's owner). The
+    other PDFs only map onto the owner's entry; when the owner goes away its
+    chunks are re-keyed to a remaining PDF instead of being removed.
+
+    Updates build a new index next to the current one and swap it in, so
+    searches only hold the lock long enough to take a reference to the
+    current generation and never wait behind an upload being written.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # _lock guards the references below; _write_lock serializes updates
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._index: Any = None
+        self._chunk_ids = np.zeros(0, dtype="int64")
+        self._sources: Dict[int, str] = {}
+        self._owners: Dict[str, int] = {}
+        self._metadata: Dict[str, Sequence[Dict[str, Any]]] = {}
+        self._loaded = False
+
+    # ------------------------------------
+    # Persistence
+    # ------------------------------------
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        with self._write_lock:
+            if self._loaded:
+                return
+            index_path = os.path.join(self.path, "index.faiss")
+            if os.path.exists(index_path):
+                index = faiss.read_index(index_path)
+                chunk_ids = np.load(os.path.join(self.path, "id_map.npy"))
+                with open(os.path.join(self.path, "sources.json"), "r", encoding="utf-8") as f:
+                    sources = {int(pdf_id): path for pdf_id, path in json.load(f).items()}
+                with self._lock:
+                    self._index, self._chunk_ids, self._sources = index, chunk_ids, sources
+                    self._owners = _owners(chunk_ids, sources)
+            self._loaded = True
+
+    def _save(self, index: Any, chunk_ids: np.ndarray, sources: Dict[int, str]) -> None:
+        os.makedirs(self.path, exist_ok=True)
+
+        # Write to temp files first so a crash never leaves a half-written index
+        index_tmp = os.path.join(self.path, "index.faiss.tmp")
+        faiss.write_index(index, index_tmp)
+        ids_tmp = os.path.join(self.path, "id_map.tmp.npy")
+        np.save(ids_tmp, chunk_ids)
+        sources_tmp = os.path.join(self.path, "sources.json.tmp")
+        with open(sources_tmp, "w", encoding="utf-8") as f:
+            json.dump({str(pdf_id): path for pdf_id, path in sources.items()}, f)
+
+        os.replace(index_tmp, os.path.join(self.path, "index.faiss"))
+        os.replace(ids_tmp, os.path.join(self.path, "id_map.npy"))
+        os.replace(sources_tmp, os.path.join(self.path, "sources.json"))
+
+    def _publish(self, index: Any, chunk_ids: np.ndarray, sources: Dict[int, str]) -> None:
+        """Saves a new generation and makes it the one searches see."""
+        self._save(index, chunk_ids, sources)
+        with self._lock:
+            self._index, self._chunk_ids, self._sources = index, chunk_ids, sources
+            self._owners = _owners(chunk_ids, sources)
+            for path in set(self._metadata) - set(sources.values()):
+                del self._metadata[path]
+
+    # ------------------------------------
+    # Updates
+    # ------------------------------------
+    def add_pdf(self, pdf_id: int, embeddings: np.ndarray, vector_path: str) -> int:
+        """
+        Adds (or replaces) the vectors of one PDF. Returns the number of chunks added.
+
+        Row i of embeddings must be chunk i of the vector store at vector_path.
+        If another PDF already indexed that store, pdf_id is only mapped onto
+        its entry and nothing is added.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        self._load()
+        with self._write_lock:
+            index, chunk_ids, sources = self._remove(pdf_id)
+            sources[int(pdf_id)] = vector_path
+            if _store_key(vector_path) in _owners(chunk_ids, sources):
+                self._publish(index, chunk_ids, sources)
+                return 0
+
+            if index is None:
+                index = faiss.IndexFlatL2(embeddings.shape[1])
+            elif index is self._index:
+                # The current index stays untouched for searches still running on it
+                index = faiss.clone_index(index)
+
+            ids = np.array([make_chunk_id(pdf_id, i) for i in range(len(embeddings))], dtype="int64")
+            index.add(embeddings)
+            self._publish(index, np.concatenate([chunk_ids, ids]), sources)
+        return len(ids)
+
+    def add_vector_store(self, pdf_id: int, vector_path: str) -> int:
+        """Adds the chunks of an existing per-PDF vector store (or maps pdf_id onto it if indexed)."""
+        owner = self._snapshot()[3].get(_store_key(vector_path))
+        if owner is not None and owner != int(pdf_id):
+            # Shared store already indexed: no need to read its vectors
+            return self.add_pdf(pdf_id, np.zeros((0, 0), dtype="float32"), vector_path)
+        index, _ = load_vector_store(vector_path)
+        return self.add_pdf(pdf_id, stored_vectors(index, vector_path), vector_path)
+
+    def remove_pdf(self, pdf_id: int) -> int:
+        """Removes a PDF. Returns the number of chunks removed (0 if its store is still shared)."""
+        self._load()
+        with self._write_lock:
+            if int(pdf_id) not in self._sources:
+                return 0
+            index, chunk_ids, sources = self._remove(pdf_id)
+            removed = len(self._chunk_ids) - len(chunk_ids)
+            self._publish(index, chunk_ids, sources)
+        return removed
+
+    def _remove(self, pdf_id: int) -> Tuple[Any, np.ndarray, Dict[int, str]]:
+        """
+        Returns the current generation without pdf_id.
+
+        The index is a modified copy when vectors had to be removed, otherwise
+        the current (shared, unmodified) index itself.
+        """
+        sources = {p: path for p, path in self._sources.items() if p != int(pdf_id)}
+        positions = np.flatnonzero((self._chunk_ids >> 32) == int(pdf_id))
+        if self._index is None or not len(positions):
+            return self._index, self._chunk_ids, sources
+
+        key = _store_key(self._sources[int(pdf_id)])
+        sharing = sorted(p for p, path in sources.items() if _store_key(path) == key)
+        if sharing:
+            # Another upload of the same file keeps the vectors: hand them over
+            chunk_ids = self._chunk_ids.copy()
+            chunk_ids[positions] = (sharing[0] << 32) | (chunk_ids[positions] & 0xFFFFFFFF)
+            return self._index, chunk_ids, sources
+
+        # The current index stays untouched for searches still running on it;
+        # IndexFlat compacts the remaining vectors in order, and so does the id map
+        index = faiss.clone_index(self._index)
+        index.remove_ids(faiss.IDSelectorBatch(positions.astype("int64")))
+        return index, np.delete(self._chunk_ids, positions), sources
+
+    # ------------------------------------
+    # Queries
+    # ------------------------------------
+    def _snapshot(self) -> Tuple[Any, np.ndarray, Dict[int, str], Dict[str, int]]:
+        self._load()
+        with self._lock:
+            return self._index, self._chunk_ids, self._sources, self._owners
+
+    def pdf_ids(self) -> List[int]:
+        return sorted(self._snapshot()[2])
+
+    def vector_path(self, pdf_id: int) -> Optional[str]:
+        return self._snapshot()[2].get(int(pdf_id))
+
+    def _chunk(self, vector_path: str, chunk_no: int) -> Dict[str, Any]:
+        with self._lock:
+            metadata = self._metadata.get(vector_path)
+        if metadata is None:
+            metadata = load_metadata(vector_path)
+            with self._lock:
+                self._metadata[vector_path] = metadata
+        return metadata[chunk_no]
+
+    def chunk_vectors(self, chunk_ids: List[int]) -> Optional[np.ndarray]:
+        """Returns the vectors of the given chunks (row i for chunk_ids[i]), or None if any is missing."""
+        index, all_ids, _, _ = self._snapshot()
+        if index is None:
+            return None
+        wanted = np.array(chunk_ids, dtype="int64")
+        matches = np.flatnonzero(np.isin(all_ids, wanted))
+        positions = dict(zip(all_ids[matches].tolist(), matches.tolist()))
+        if any(int(cid) not in positions for cid in wanted):
+            return None
+        return np.vstack([index.reconstruct(positions[int(cid)]) for cid in wanted])
+
+    def search(
+        self,
+        query: str,
+        pdf_ids: Optional[Iterable[int]] = None,
+        top_k: int = 5
+    ) -> List[Dict[str, Any]]:
+        """
+        Searches every indexed PDF, or only those in pdf_ids, with one index lookup.
+        """
+        if not query.strip():
+            return []
+
+        query_embedding = encode_query(query)
+
+        index, chunk_ids, sources, owners = self._snapshot()
+        if index is None or index.ntotal == 0:
+            return []
+
+        params = None
+        # Results of a shared store are reported under a requested PDF that uses it
+        report_as: Dict[int, int] = {}
+        if pdf_ids is not None:
+            for pdf_id in sorted(set(int(p) for p in pdf_ids) & set(sources)):
+                report_as.setdefault(owners[_store_key(sources[pdf_id])], pdf_id)
+            mask = np.isin(chunk_ids >> 32, np.fromiter(report_as, dtype="int64"))
+            if not mask.any():
+                return []
+            bitmap = np.packbits(mask, bitorder="little")
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap)))
+
+        with compute_scheduler.interactive():
+            distances, positions = index.search(query_embedding, top_k, params=params)
+
+        results: List[Dict[str, Any]] = []
+        for pos, dist in zip(positions[0], distances[0]):
+            if pos == -1:
+                continue
+            chunk_id = int(chunk_ids[pos])
+            owner = chunk_id >> 32
+            row = self._chunk(sources[owner], chunk_id & 0xFFFFFFFF)
+            results.append({
+                "pdf_id": report_as.get(owner, owner),
+                "page": row["page"],
+                "text": row["text"],
+                "has_images": row.get("has_images", False),
+                "chunk_id": chunk_id,
+                "distance": float(dist)
+            })
+
+        return results
+
+
+def _store_key(vector_path: str) -> str:
+    return os.path.normpath(vector_path)
+
+
+def _owners(chunk_ids: np.ndarray, sources: Dict[int, str]) -> Dict[str, int]:
+    """Maps each indexed vector store to the PDF id its chunks are keyed by."""
+    return {_store_key(sources[int(owner)]): int(owner) for owner in np.unique(chunk_ids >> 32)}
+
+
+# Process-wide global index shared by all Streamlit sessions
+global_index = GlobalIndex(GLOBAL_INDEX_PATH)
+
+
+def add_pdf_to_global_index(pdf_id: int, vector_path: str) -> int:
+    """Adds an indexed PDF to the global cross-document index."""
+    return global_index.add_vector_store(pdf_id, vector_path)
+
+
+def ensure_pdfs_indexed(vector_paths: Dict[int, str]) -> int:
+    """
+    Adds PDFs that are not in the global index yet (e.g. uploaded before it existed).
+
+    Args:
+        vector_paths: Mapping of pdf_id to its per-PDF vector store path
+
+    Returns:
+        Number of PDFs added
+    """
+    indexed = set(global_index.pdf_ids())
+    added = 0
+    for pdf_id, vector_path in vector_paths.items():
+        if pdf_id in indexed or not os.path.exists(vector_path):
+            continue
+        try:
+            global_index.add_vector_store(pdf_id, vector_path)
+            added += 1
+        except Exception as e:
+            print(f"⚠️ Could not add PDF {pdf_id} to the global index: {e}")
+    return added
+
+
+def remove_pdf_from_global_index(pdf_id: int) -> int:
+    """Removes a PDF's vectors from the global cross-document index."""
+    return global_index.remove_pdf(pdf_id)
+
+
+def search_all_documents(
+    query: str,
+    pdf_ids: Optional[Iterable[int]] = None,
+    top_k: int = 5
+) -> List[Dict[str, Any]]:
+    """Searches one PDF, a set of PDFs or (pdf_ids=None) every indexed PDF."""
+    return global_index.search(query, pdf_ids=pdf_ids, top_k=top_k)
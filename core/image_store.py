@@ -0,0 +1,289 @@
+import base64
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, List, Mapping
+
+from core.pdf_processor import extract_page_images
+
+IMAGES_DIR = "images"
+IMAGE_INDEX_FILE = os.path.join(IMAGES_DIR, "index.json")
+IMAGE_REFS_FILE = "image_refs.json"
+
+# Single pickle of every page's base64 images, written by older versions
+IMAGES_FILE = "images.pkl"
+
+# "eager" encodes page images at upload time; "lazy" only records references
+# (page, xref, size) and extracts an image the first time an answer needs it
+IMAGE_MODE = os.getenv("IMAGE_MODE", "eager")
+
+# On-disk cache of lazily extracted images, evicted least recently used first
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "data/image_cache")
+IMAGE_CACHE_MAX_MB = float(os.getenv("IMAGE_CACHE_MAX_MB", "256"))
+
+
+class ImageCache:
+    """
+    Bounded on-disk cache of extracted page images.
+
+    Each entry is one file holding the JPEG bytes of a page's images; hits
+    refresh the file's mtime, and the oldest files are removed once the
+    directory exceeds its budget.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Disk usage is read from the directory on first use
+        self._bytes = 0
+        self._scanned = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.extract_ms = 0.0
+
+    def _scan(self) -> None:
+        if not self._scanned:
+            os.makedirs(self.path, exist_ok=True)
+            self._bytes = sum(entry.stat().st_size for entry in os.scandir(self.path) if entry.is_file())
+            self._scanned = True
+
+    def get_or_create(self, key: str, create: Callable[[], List[bytes]]) -> List[bytes]:
+        """Returns the cached images for key, extracting and storing them on a miss."""
+        file_path = os.path.join(self.path, f"{key}.pkl")
+        with self._lock:
+            self._scan()
+            if os.path.exists(file_path):
+                try:
+                    with open(file_path, "rb") as f:
+                        images = pickle.load(f)
+                    os.utime(file_path)
+                    self.hits += 1
+                    return images
+                except Exception as e:
+                    print(f"⚠️ Discarding unreadable cached images {key}: {e}")
+
+        start = time.perf_counter()
+        images = create()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        tmp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(images, f, protocol=pickle.HIGHEST_PROTOCOL)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            replaced = os.path.getsize(file_path) if os.path.exists(file_path) else 0
+            os.replace(tmp_path, file_path)
+            self._bytes += size - replaced
+            self.misses += 1
+            self.extract_ms += elapsed_ms
+            self._evict(keep=file_path)
+        return images
+
+    def _evict(self, keep: str) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        entries = sorted(
+            (entry for entry in os.scandir(self.path) if entry.is_file() and entry.path != keep),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        for entry in entries:
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+            except FileNotFoundError:
+                continue
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters, extraction time and disk usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "mode": IMAGE_MODE,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "avg_extract_ms": self.extract_ms / self.misses if self.misses else 0.0,
+                "size_mb": self._bytes / 1024 / 1024,
+                "max_mb": self.max_bytes / 1024 / 1024
+            }
+
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {"pages_read": 0, "files_read": 0, "bytes_read": 0}
+
+
+# Process-wide image cache shared by all Streamlit sessions
+image_cache = ImageCache(IMAGE_CACHE_DIR, int(IMAGE_CACHE_MAX_MB * 1024 * 1024))
+
+
+class LazyPageImages(Mapping[int, List[str]]):
+    """
+    Page number -> base64 JPEG images of a store ingested in "lazy" mode.
+
+    Images are extracted from the PDF on first access and kept in the
+    shared on-disk image cache.
+    """
+
+    def __init__(self, pdf_path: str, refs: Dict[int, List[Dict[str, Any]]], cache: ImageCache = image_cache):
+        self.pdf_path = pdf_path
+        self.refs = refs
+        self.cache = cache
+
+    def __getitem__(self, page: int) -> List[str]:
+        refs = self.refs[page]
+        stat = os.stat(self.pdf_path)
+        # The PDF's size and mtime identify its revision
+        key = hashlib.sha1(json.dumps(
+            [os.path.abspath(self.pdf_path), stat.st_size, stat.st_mtime_ns, page, refs]
+        ).encode("utf-8")).hexdigest()
+        jpegs = self.cache.get_or_create(key, lambda: extract_page_images(self.pdf_path, page, refs))
+        return [base64.b64encode(jpeg).decode() for jpeg in jpegs]
+
+    def get(self, page: int, default: Any = None) -> Any:
+        if page not in self.refs:
+            return default
+        try:
+            return self[page]
+        except Exception as e:
+            print(f"Error loading images of page {page}: {e}")
+            return default if default is not None else []
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.refs)
+
+    def __len__(self) -> int:
+        return len(self.refs)
+
+
+class PageImageWriter:
+    """
+    Writes the images of a vector store as one JPEG file per image.
+
+    Files go to images/<page>_<n>.jpg next to a page -> filenames index, so a
+    query reads only the files of the pages it cites. Everything is written
+    to a temporary directory and swapped in by commit().
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.tmp_dir = os.path.join(path, IMAGES_DIR + ".tmp")
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.pages: Dict[str, List[str]] = {}
+
+    def write(self, page: int, jpegs: List[bytes]) -> None:
+        names = []
+        for i, jpeg in enumerate(jpegs):
+            name = f"{page}_{i}.jpg"
+            with open(os.path.join(self.tmp_dir, name), "wb") as f:
+                f.write(jpeg)
+            names.append(name)
+        if names:
+            self.pages[str(page)] = names
+
+    def commit(self) -> None:
+        with open(os.path.join(self.tmp_dir, "index.json"), "w", encoding="utf-8") as f:
+            json.dump({"pages": self.pages}, f)
+        _remove_page_images(self.path)
+        os.replace(self.tmp_dir, os.path.join(self.path, IMAGES_DIR))
+
+    def discard(self) -> None:
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class PageImageFiles(Mapping[int, List[str]]):
+    """Page number -> base64 JPEG images, read from the per-image files on access."""
+
+    def __init__(self, path: str, pages: Dict[int, List[str]]):
+        self.images_dir = os.path.join(path, IMAGES_DIR)
+        self.pages = pages
+
+    def __getitem__(self, page: int) -> List[str]:
+        images = []
+        for name in self.pages[page]:
+            with open(os.path.join(self.images_dir, name), "rb") as f:
+                jpeg = f.read()
+            images.append(base64.b64encode(jpeg).decode())
+            with _stats_lock:
+                _stats["files_read"] += 1
+                _stats["bytes_read"] += len(jpeg)
+        with _stats_lock:
+            _stats["pages_read"] += 1
+        return images
+
+    def get(self, page: int, default: Any = None) -> Any:
+        if page not in self.pages:
+            return default
+        try:
+            return self[page]
+        except Exception as e:
+            print(f"Error loading images of page {page}: {e}")
+            return default if default is not None else []
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self.pages)
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+
+def _remove_page_images(path: str) -> None:
+    """Deletes the images a store was previously written with, in any format."""
+    shutil.rmtree(os.path.join(path, IMAGES_DIR), ignore_errors=True)
+    for name in (IMAGES_FILE, IMAGE_REFS_FILE):
+        if os.path.exists(os.path.join(path, name)):
+            os.remove(os.path.join(path, name))
+
+
+def write_image_refs(path: str, pdf_path: str, refs: Dict[int, List[Dict[str, Any]]]) -> None:
+    """Saves the image references of a lazily ingested store."""
+    _remove_page_images(path)
+    with open(os.path.join(path, IMAGE_REFS_FILE), "w", encoding="utf-8") as f:
+        json.dump({"pdf_path": pdf_path, "pages": {str(page): page_refs for page, page_refs in refs.items()}}, f)
+
+
+def load_page_images(path: str) -> Mapping[int, List[str]]:
+    """
+    Opens the page images of a vector store.
+
+    Returns a PageImageFiles over the images/ directory, or a LazyPageImages
+    over image_refs.json for lazily ingested stores. Older stores keep a
+    page -> base64 images dict in images.pkl, which is read whole.
+    """
+    index_path = os.path.join(path, IMAGE_INDEX_FILE)
+    if os.path.exists(index_path):
+        with open(index_path, "r", encoding="utf-8") as f:
+            pages = json.load(f)["pages"]
+        return PageImageFiles(path, {int(page): names for page, names in pages.items()})
+
+    refs_path = os.path.join(path, IMAGE_REFS_FILE)
+    if os.path.exists(refs_path):
+        with open(refs_path, "r", encoding="utf-8") as f:
+            refs = json.load(f)
+        return LazyPageImages(refs["pdf_path"], {int(page): r for page, r in refs["pages"].items()})
+
+    images_path = os.path.join(path, IMAGES_FILE)
+    if not os.path.exists(images_path):
+        return {}
+    with open(images_path, "rb") as f:
+        return pickle.load(f)
+
+
+def get_image_stats() -> Dict[str, Any]:
+    """Returns how many image files queries read and the image cache statistics."""
+    stats = image_cache.stats()
+    with _stats_lock:
+        stats.update(_stats)
+    stats["avg_kb_per_page"] = stats["bytes_read"] / 1024 / stats["pages_read"] if stats["pages_read"] else 0.0
+    return stats
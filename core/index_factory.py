@@ -0,0 +1,289 @@
+import os
+import math
+import faiss  # type: ignore
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+# Index type for new vector stores: "auto" picks one from the number of vectors,
+# "flat", "ivf_flat" or "hnsw" force a type
+VECTOR_INDEX_TYPE = os.getenv("VECTOR_INDEX_TYPE", "auto")
+
+# Corpus sizes at which "auto" switches index type (see `python benchmark.py ann`)
+HNSW_MIN_VECTORS = int(os.getenv("ANN_HNSW_MIN_VECTORS", "20000"))
+IVF_MIN_VECTORS = int(os.getenv("ANN_IVF_MIN_VECTORS", "500000"))
+
+# Search-time parameters; when set they override the values saved with the index
+ANN_NPROBE = os.getenv("ANN_NPROBE")
+ANN_EF_SEARCH = os.getenv("ANN_EF_SEARCH")
+
+# Vector compression for new indices: "none", "sq8" (4x smaller), "pq" (16x smaller)
+# or "binary" (sign bits, 32x smaller, searched by Hamming distance)
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none")
+
+# Compressed indices fetch rerank_factor * top_k candidates and re-rank them exactly
+# against the full vectors, which stay on disk and are only memory-mapped
+VECTOR_RERANK = os.getenv("VECTOR_RERANK", "1") == "1"
+VECTOR_RERANK_FACTOR = os.getenv("VECTOR_RERANK_FACTOR")
+
+# PQ distances are coarser than SQ8, so it needs a deeper candidate list for the
+# same recall@5 (see `python benchmark.py compress`)
+RERANK_FACTORS = {"sq8": 4, "pq": 10}
+
+# Binary indices prefilter this many candidates by Hamming distance (or top_k if
+# larger) before the exact re-rank (see `python benchmark.py binary`)
+BINARY_CANDIDATES = int(os.getenv("BINARY_CANDIDATES", "256"))
+
+# Project vectors onto this many principal components before indexing (0 keeps
+# the model's dimension); the PCA matrix is saved inside index.faiss and applied
+# to queries by FAISS itself (see `python benchmark.py pca`)
+VECTOR_PCA_DIM = int(os.getenv("VECTOR_PCA_DIM", "0"))
+
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw")
+COMPRESSIONS = ("none", "sq8", "pq", "binary")
+
+# PQ sub-quantizers: 4 dims per 8-bit code gives 16x compression of float32
+PQ_DIMS_PER_CODE = 4
+# PQ needs ~39 training points per centroid (256 per sub-quantizer)
+PQ_MIN_VECTORS = 256 * 39
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 80
+HNSW_EF_SEARCH = 64
+
+
+def choose_index_type(num_vectors: int) -> str:
+    """
+    Picks an index type for a corpus of the given size.
+
+    Exact search is cheap enough for small documents; HNSW gives the best
+    latency/recall for mid-sized corpora without training, and IVF-Flat keeps
+    memory and build time in check for very large (multi-PDF) corpora.
+    """
+    if num_vectors >= IVF_MIN_VECTORS:
+        return "ivf_flat"
+    if num_vectors >= HNSW_MIN_VECTORS:
+        return "hnsw"
+    return "flat"
+
+
+def ivf_nlist(num_vectors: int) -> int:
+    """Number of IVF cells: about 4 * sqrt(n), with at least 39 training points per cell."""
+    return max(1, min(int(4 * math.sqrt(num_vectors)), num_vectors // 39))
+
+
+def _training_sample(embeddings: np.ndarray, max_points: int) -> np.ndarray:
+    num_vectors = embeddings.shape[0]
+    if num_vectors <= max_points:
+        return embeddings
+    rng = np.random.default_rng(0)
+    return embeddings[np.sort(rng.choice(num_vectors, max_points, replace=False))]
+
+
+def sign_bits(vectors: np.ndarray) -> np.ndarray:
+    """Packs the sign of every component into bits: (n, d) float -> (n, ceil(d / 8)) uint8."""
+    return np.packbits(np.asarray(vectors) > 0, axis=1)
+
+
+def _build_binary_index(embeddings: np.ndarray) -> Tuple[Any, Dict[str, Any]]:
+    # A Hamming scan reads 1 bit per dimension, so it stays exhaustive; the
+    # codes carry no usable L2 distance, so candidates are always re-ranked
+    codes = sign_bits(embeddings)
+    index = faiss.IndexBinaryFlat(codes.shape[1] * 8)
+    index.add(codes)
+
+    config: Dict[str, Any] = {
+        "index_type": "flat",
+        "compression": "binary",
+        "rerank": True,
+        "rerank_candidates": BINARY_CANDIDATES
+    }
+    return rerank_index(index, embeddings, config), config
+
+
+def build_index(
+    embeddings: np.ndarray,
+    index_type: Optional[str] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    compression: Optional[str] = None,
+    pca_dim: Optional[int] = None
+) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Builds (and trains, if needed) a FAISS index over the embeddings.
+
+    Returns the index and the configuration needed to restore it on load.
+    """
+    num_vectors, dimension = embeddings.shape
+    index_type = index_type or VECTOR_INDEX_TYPE
+    if index_type == "auto":
+        index_type = choose_index_type(num_vectors)
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type: {index_type}")
+
+    compression = compression or VECTOR_COMPRESSION
+    if compression not in COMPRESSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    if compression == "binary":
+        if pca_dim:
+            print("⚠️  PCA does not apply to binary indices, keeping the model's dimension")
+        return _build_binary_index(embeddings)
+    if compression == "pq" and num_vectors < PQ_MIN_VECTORS:
+        # Too few vectors to train 256 centroids per sub-quantizer
+        print(f"⚠️  {num_vectors} vectors are too few for PQ, using SQ8 instead")
+        compression = "sq8"
+
+    pca_dim = VECTOR_PCA_DIM if pca_dim is None else pca_dim
+    if pca_dim and pca_dim >= dimension:
+        pca_dim = 0
+    elif pca_dim and num_vectors < pca_dim:
+        # Fewer vectors than components: the projection would be underdetermined
+        print(f"⚠️  {num_vectors} vectors are too few for PCA to {pca_dim} dims, keeping {dimension}")
+        pca_dim = 0
+
+    config: Dict[str, Any] = {"index_type": index_type, "compression": compression}
+    input_dimension = dimension
+    if pca_dim:
+        dimension = pca_dim
+        config["pca_dim"] = pca_dim
+    pq_m = dimension // PQ_DIMS_PER_CODE
+    sq8 = faiss.ScalarQuantizer.QT_8bit
+
+    if index_type == "ivf_flat":
+        nlist = ivf_nlist(num_vectors)
+        quantizer = faiss.IndexFlatL2(dimension)
+        if compression == "sq8":
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, nlist, sq8, faiss.METRIC_L2)
+        elif compression == "pq":
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8)
+        else:
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_L2)
+        # k-means needs ~40-256 points per cell; sample to bound training time
+        train_points = nlist * 256
+
+        config["nlist"] = nlist
+        config["nprobe"] = nprobe or max(1, min(nlist, nlist // 16))
+    elif index_type == "hnsw":
+        if compression == "sq8":
+            index = faiss.IndexHNSWSQ(dimension, sq8, HNSW_M)
+        elif compression == "pq":
+            index = faiss.IndexHNSWPQ(dimension, pq_m, HNSW_M)
+        else:
+            index = faiss.IndexHNSWFlat(dimension, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        train_points = 256 * 256
+
+        config["M"] = HNSW_M
+        config["efSearch"] = ef_search or HNSW_EF_SEARCH
+    else:
+        if compression == "sq8":
+            index = faiss.IndexScalarQuantizer(dimension, sq8, faiss.METRIC_L2)
+        elif compression == "pq":
+            index = faiss.IndexPQ(dimension, pq_m, 8)
+        else:
+            index = faiss.IndexFlatL2(dimension)
+        train_points = 256 * 256
+
+    if compression == "pq":
+        config["pq_m"] = pq_m
+
+    if pca_dim:
+        # Trained together with the index; queries keep the model's dimension
+        index = faiss.IndexPreTransform(faiss.PCAMatrix(input_dimension, pca_dim), index)
+
+    if not index.is_trained:
+        index.train(_training_sample(embeddings, train_points))
+    index.add(embeddings)
+
+    configure_search(index, config)
+
+    if compression != "none" and VECTOR_RERANK:
+        rerank_factor = int(VECTOR_RERANK_FACTOR) if VECTOR_RERANK_FACTOR else RERANK_FACTORS[compression]
+        config["rerank"] = True
+        config["rerank_factor"] = rerank_factor
+        index = rerank_index(index, embeddings, config)
+
+    return index, config
+
+
+def rerank_index(index: Any, vectors: np.ndarray, config: Dict[str, Any]) -> "RerankIndex":
+    """Wraps a compressed index in the exact re-rank matching its configuration."""
+    if config.get("compression") == "binary":
+        return BinaryRerankIndex(index, vectors, config.get("rerank_candidates", BINARY_CANDIDATES))
+    return RerankIndex(index, vectors, config.get("rerank_factor", 4))
+
+
+class RerankIndex:
+    """
+    Wraps a compressed index and re-ranks its candidates with exact L2 distances.
+
+    The full vectors are typically a memory-mapped (half-precision) .npy file,
+    so only the rows of the candidates are read from disk.
+    """
+
+    def __init__(self, index: Any, vectors: np.ndarray, rerank_factor: int):
+        self.index = index
+        self.vectors = vectors
+        self.rerank_factor = rerank_factor
+        self.ntotal, self.d = index.ntotal, index.d
+
+    def _candidates(self, queries: np.ndarray, k: int) -> np.ndarray:
+        return self.index.search(queries, k * self.rerank_factor)[1]
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.ascontiguousarray(queries, dtype="float32")
+        candidates = self._candidates(queries, k)
+
+        distances = np.full((len(queries), k), np.finfo("float32").max, dtype="float32")
+        indices = np.full((len(queries), k), -1, dtype="int64")
+
+        for row, (query, ids) in enumerate(zip(queries, candidates)):
+            ids = ids[ids != -1]
+            if len(ids) == 0:
+                continue
+            # Read candidate rows in file order, then restore candidate order
+            order = np.argsort(ids)
+            rows = np.empty((len(ids), self.d), dtype="float32")
+            rows[order] = self.vectors[ids[order]]
+            exact = ((rows - query) ** 2).sum(axis=1)
+            best = np.argsort(exact, kind="stable")[:k]
+            distances[row, :len(best)] = exact[best]
+            indices[row, :len(best)] = ids[best]
+
+        return distances, indices
+
+    def reconstruct(self, key: int) -> np.ndarray:
+        return np.array(self.vectors[key], dtype="float32")
+
+
+class BinaryRerankIndex(RerankIndex):
+    """
+    Prefilters with a Hamming-distance scan over sign bits, then re-ranks the
+    candidates with exact L2 distances against the full vectors.
+    """
+
+    def __init__(self, index: Any, vectors: np.ndarray, candidates: int):
+        self.index = index
+        self.vectors = vectors
+        self.candidates = candidates
+        self.ntotal, self.d = index.ntotal, vectors.shape[1]
+
+    def _candidates(self, queries: np.ndarray, k: int) -> np.ndarray:
+        return self.index.search(sign_bits(queries), min(max(k, self.candidates), self.ntotal))[1]
+
+
+def configure_search(index: Any, config: Dict[str, Any]) -> None:
+    """Applies the saved (or environment-overridden) search parameters to an index."""
+    index_type = config.get("index_type", "flat")
+    if isinstance(index, RerankIndex):
+        index = index.index
+    if isinstance(index, faiss.IndexPreTransform):
+        index = faiss.downcast_index(index.index)
+
+    if index_type == "ivf_flat":
+        nprobe = int(ANN_NPROBE) if ANN_NPROBE else config.get("nprobe")
+        if nprobe:
+            faiss.extract_index_ivf(index).nprobe = int(nprobe)
+    elif index_type == "hnsw":
+        ef_search = int(ANN_EF_SEARCH) if ANN_EF_SEARCH else config.get("efSearch")
+        if ef_search:
+            faiss.downcast_index(index).hnsw.efSearch = int(ef_search)
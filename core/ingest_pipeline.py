@@ -0,0 +1,316 @@
+import os
+import queue
+import tempfile
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from core.embeddings import (
+    documents_metadata,
+    encode_documents,
+    reusable_vectors,
+    reused_positions,
+    sample_seconds_per_chunk,
+    save_vector_store,
+    write_page_hashes
+)
+from core.image_store import IMAGE_MODE, PageImageWriter, write_image_refs
+from core.pdf_processor import iter_page_results
+
+# Items each bounded queue holds; a full queue blocks the stage feeding it
+PIPELINE_QUEUE_SIZE = int(os.getenv("PIPELINE_QUEUE_SIZE", "8"))
+
+# Chunks encoded per embedding call
+PIPELINE_EMBED_BATCH = int(os.getenv("PIPELINE_EMBED_BATCH", "64"))
+
+# How often the memory sampler reads the process RSS
+_SAMPLE_INTERVAL_S = 0.02
+
+_DONE = object()
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except FileNotFoundError:
+        pass
+    import resource
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class _StageMonitor:
+    """
+    Tracks items, busy time and peak process RSS of each pipeline stage.
+
+    Stages share one process, so a stage's peak is the highest RSS sampled
+    while it was working on an item.
+    """
+
+    def __init__(self, stages: List[str]):
+        self._lock = threading.Lock()
+        self._active = {name: 0 for name in stages}
+        self._stats = {name: {"items": 0, "busy_s": 0.0, "peak_rss_mb": 0.0} for name in stages}
+        self._stop = threading.Event()
+        self.baseline_mb = _rss_mb()
+        self.peak_mb = self.baseline_mb
+        self._sampler = threading.Thread(target=self._sample, name="ingest-memory", daemon=True)
+        self._sampler.start()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(_SAMPLE_INTERVAL_S):
+            self._record(_rss_mb())
+
+    def _record(self, rss: float) -> None:
+        with self._lock:
+            self.peak_mb = max(self.peak_mb, rss)
+            for name, active in self._active.items():
+                if active:
+                    self._stats[name]["peak_rss_mb"] = max(self._stats[name]["peak_rss_mb"], rss)
+
+    def run(self, name: str, work: Callable[[], Any]) -> Any:
+        with self._lock:
+            self._active[name] += 1
+        start = time.perf_counter()
+        try:
+            return work()
+        finally:
+            self._record(_rss_mb())
+            with self._lock:
+                self._active[name] -= 1
+                self._stats[name]["items"] += 1
+                self._stats[name]["busy_s"] += time.perf_counter() - start
+
+    def close(self) -> Dict[str, Dict[str, Any]]:
+        self._stop.set()
+        self._sampler.join()
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+
+class _Pipeline:
+    """Stage threads connected by bounded queues; the first failure stops every stage."""
+
+    def __init__(self) -> None:
+        self.error: Optional[BaseException] = None
+        self.failed = threading.Event()
+        self.threads: List[threading.Thread] = []
+
+    def put(self, q: "queue.Queue[Any]", item: Any) -> None:
+        # Back-pressure: wait for room, but give up once another stage has failed
+        while not self.failed.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+        raise RuntimeError("ingestion pipeline stopped")
+
+    def get(self, q: "queue.Queue[Any]") -> Any:
+        while not self.failed.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        raise RuntimeError("ingestion pipeline stopped")
+
+    def start(self, name: str, target: Callable[[], None]) -> None:
+        def _run() -> None:
+            try:
+                target()
+            except BaseException as e:
+                if self.error is None:
+                    self.error = e
+                self.failed.set()
+
+        thread = threading.Thread(target=_run, name=f"ingest-{name}", daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def join(self) -> None:
+        for thread in self.threads:
+            thread.join()
+        if self.error is not None:
+            raise self.error
+
+
+def ingest_pdf(
+    pdf_path: str,
+    save_path: str,
+    previous_path: Optional[str] = None,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    backend: Optional[str] = None,
+    workers: Optional[int] = None,
+    storage: Optional[str] = None,
+    index_type: Optional[str] = None,
+    compression: Optional[str] = None,
+    pca_dim: Optional[int] = None,
+    image_mode: Optional[str] = None
+) -> Tuple[Any, List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Indexes a PDF into save_path as a stream, in roughly constant memory.
+
+    Stages run in their own threads, connected by queues of PIPELINE_QUEUE_SIZE:
+    extract (pages -> chunks and JPEG images) feeds embed (batches of
+    PIPELINE_EMBED_BATCH chunks, appended to a vector file on disk) and images
+    (one JPEG file per image under images/); index then builds the vector store
+    from the memory-mapped vectors. Only chunk texts are kept for the whole document.
+
+    In "lazy" image mode (IMAGE_MODE) pages are not rendered or encoded: the
+    images stage only records each page's image references in image_refs.json,
+    and images are extracted on first use by core.image_store.
+
+    With previous_path (a revision), pages whose content hash and chunks match
+    the previous store reuse its vectors instead of being embedded again.
+
+    Returns:
+        The index, the chunk metadata and a report with counts, timings and
+        the peak process RSS observed while each stage was busy
+    """
+    start = time.perf_counter()
+    os.makedirs(save_path, exist_ok=True)
+    lazy_images = (image_mode or IMAGE_MODE) == "lazy"
+
+    by_hash: Dict[str, List[int]] = {}
+    previous_metadata: Any = []
+    previous_vectors = np.zeros((0, 0), dtype="float32")
+    if previous_path and os.path.exists(previous_path):
+        by_hash, previous_metadata, previous_vectors = reusable_vectors(previous_path)
+
+    monitor = _StageMonitor(["extract", "embed", "images", "index"])
+    pipeline = _Pipeline()
+    chunk_queue: "queue.Queue[Any]" = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    image_queue: "queue.Queue[Any]" = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+
+    documents: List[Dict[str, Any]] = []
+    counts = {"pages": 0, "images": 0, "reused_chunks": 0, "embedded_chunks": 0, "reused_pages": 0, "changed_pages": 0}
+    vectors_file = tempfile.NamedTemporaryFile(dir=save_path, suffix=".f32", delete=False)
+    image_writer = None if lazy_images else PageImageWriter(save_path)
+    image_refs: Dict[int, List[Dict[str, Any]]] = {}
+    dimension = [0]
+
+    def extract() -> None:
+        results = iter_page_results(
+            pdf_path, chunk_size, overlap, backend, workers, image_output="refs" if lazy_images else "jpeg"
+        )
+        while True:
+            result = monitor.run("extract", lambda: next(results, _DONE))
+            if result is _DONE:
+                break
+            page_num, chunks, images = result
+            counts["pages"] += 1
+            pipeline.put(image_queue, (page_num, images))
+            pipeline.put(chunk_queue, chunks)
+        pipeline.put(image_queue, _DONE)
+        pipeline.put(chunk_queue, _DONE)
+
+    def write_vectors(rows: List[Any]) -> None:
+        # rows hold either a text to embed or a reused vector, in chunk order
+        texts = [row for row in rows if isinstance(row, str)]
+        encoded: Iterator[np.ndarray] = iter(encode_documents(texts, show_progress_bar=False) if texts else [])
+        block = np.vstack([next(encoded) if isinstance(row, str) else row for row in rows]).astype("float32")
+        dimension[0] = block.shape[1]
+        vectors_file.write(block.tobytes())
+
+    def embed() -> None:
+        pending: List[Any] = []
+        pending_texts = 0
+        while True:
+            chunks = pipeline.get(chunk_queue)
+            if chunks is _DONE:
+                break
+            documents.extend(chunks)
+
+            old_positions = reused_positions(chunks, by_hash, previous_metadata)
+            if old_positions is not None:
+                pending.extend(np.asarray(previous_vectors[o], dtype="float32") for o in old_positions)
+                counts["reused_chunks"] += len(chunks)
+                counts["reused_pages"] += 1
+            elif chunks:
+                pending.extend(c["text"] for c in chunks)
+                pending_texts += len(chunks)
+                counts["embedded_chunks"] += len(chunks)
+                counts["changed_pages"] += 1
+
+            if pending_texts >= PIPELINE_EMBED_BATCH or len(pending) >= PIPELINE_EMBED_BATCH * 4:
+                monitor.run("embed", lambda: write_vectors(pending))
+                pending, pending_texts = [], 0
+        if pending:
+            monitor.run("embed", lambda: write_vectors(pending))
+
+    def write_images() -> None:
+        while True:
+            item = pipeline.get(image_queue)
+            if item is _DONE:
+                break
+            page_num, images = item
+            counts["images"] += len(images)
+            if image_writer is not None:
+                monitor.run("images", lambda: image_writer.write(page_num, images))
+            elif images:
+                image_refs[page_num] = images
+
+    try:
+        pipeline.start("extract", extract)
+        pipeline.start("embed", embed)
+        pipeline.start("images", write_images)
+        pipeline.join()
+        vectors_file.close()
+
+        if not documents:
+            raise Exception("No text or images could be extracted from the PDF")
+
+        embeddings = np.memmap(vectors_file.name, dtype="float32", mode="r", shape=(len(documents), dimension[0]))
+        metadata = documents_metadata(documents)
+        index = monitor.run("index", lambda: save_vector_store(
+            embeddings, metadata, save_path,
+            storage=storage, index_type=index_type, compression=compression, pca_dim=pca_dim
+        ))
+        write_page_hashes(documents, save_path)
+        if image_writer is not None:
+            image_writer.commit()
+        else:
+            write_image_refs(save_path, pdf_path, image_refs)
+    finally:
+        stages = monitor.close()
+        vectors_file.close()
+        if os.path.exists(vectors_file.name):
+            os.remove(vectors_file.name)
+        if image_writer is not None:
+            image_writer.discard()
+
+    # Embedding rate for the time-saved estimate (sampled when nothing had to be embedded)
+    if counts["embedded_chunks"]:
+        seconds_per_chunk = stages["embed"]["busy_s"] / counts["embedded_chunks"]
+    elif counts["reused_chunks"]:
+        seconds_per_chunk = sample_seconds_per_chunk([d["text"] for d in documents])
+    else:
+        seconds_per_chunk = 0.0
+
+    report = {
+        "pages": counts["pages"],
+        "indexed_pages": len(set(d["page"] for d in documents)),
+        "chunks": len(documents),
+        "images": counts["images"],
+        "reused_chunks": counts["reused_chunks"],
+        "embedded_chunks": counts["embedded_chunks"],
+        "reused_pages": counts["reused_pages"],
+        "changed_pages": counts["changed_pages"],
+        # Embedding time the reused chunks would have taken
+        "seconds_saved": seconds_per_chunk * counts["reused_chunks"],
+        "total_seconds": time.perf_counter() - start,
+        "baseline_rss_mb": monitor.baseline_mb,
+        "peak_rss_mb": monitor.peak_mb,
+        "stages": stages
+    }
+    print(
+        f"✅ Ingested {report['chunks']} chunks and {report['images']} images from {report['pages']} pages "
+        f"in {report['total_seconds']:.1f}s (peak RSS {report['peak_rss_mb']:.0f} MB)"
+    )
+    for name, stats in stages.items():
+        print(f"   {name}: {stats['items']} items, {stats['busy_s']:.2f}s busy, peak RSS {stats['peak_rss_mb']:.0f} MB")
+    return index, metadata, report
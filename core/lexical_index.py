@@ -0,0 +1,163 @@
+import os
+import re
+import numpy as np
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+LEXICAL_FILE = "lexical.npz"
+
+# Standard BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Constant of reciprocal rank fusion; 60 is the usual choice from the RRF paper
+RRF_K = 60
+
+# Words joined by - . / _ (part numbers, error codes, clause ids) are kept whole
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-./_][a-z0-9]+)*")
+_PART_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercased word tokens of text.
+
+    Compound tokens such as "e-4021" or "7.3.1" are emitted whole and as their
+    parts, so both an exact code and its pieces match.
+    """
+    tokens: List[str] = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        parts = _PART_RE.findall(token)
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over the chunks of one vector store.
+
+    Postings are stored as CSR-style arrays: the documents of term t are
+    doc_ids[offsets[t]:offsets[t + 1]] with matching term frequencies.
+    """
+
+    def __init__(
+        self,
+        terms: np.ndarray,
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        term_freqs: np.ndarray,
+        doc_lengths: np.ndarray
+    ):
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.term_freqs = term_freqs
+        self.doc_lengths = doc_lengths
+        self.vocab: Dict[str, int] = {str(term): i for i, term in enumerate(terms)}
+
+        num_docs = len(doc_lengths)
+        doc_freqs = np.diff(offsets)
+        self.idf = np.log1p((num_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype("float32")
+        avg_length = float(doc_lengths.mean()) if num_docs else 0.0
+        # Per-document part of the BM25 denominator, precomputed once
+        self.length_norm = (BM25_K1 * (1 - BM25_B + BM25_B * doc_lengths / max(avg_length, 1e-9))).astype("float32")
+
+    @classmethod
+    def build(cls, texts: Iterable[str]) -> "LexicalIndex":
+        """Builds the index from chunk texts (document ids are their positions)."""
+        postings: Dict[str, List[Tuple[int, int]]] = {}
+        doc_lengths: List[int] = []
+
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            doc_lengths.append(sum(counts.values()))
+            for term, count in counts.items():
+                postings.setdefault(term, []).append((doc_id, count))
+
+        terms = sorted(postings)
+        offsets = np.zeros(len(terms) + 1, dtype="int64")
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(postings[term])
+
+        doc_ids = np.empty(offsets[-1], dtype="int32")
+        term_freqs = np.empty(offsets[-1], dtype="uint16")
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            doc_ids[offsets[i]:offsets[i + 1]] = [doc for doc, _ in entries]
+            term_freqs[offsets[i]:offsets[i + 1]] = [min(count, 65535) for _, count in entries]
+
+        return cls(
+            np.array(terms, dtype=str),
+            offsets,
+            doc_ids,
+            term_freqs,
+            np.array(doc_lengths, dtype="int32")
+        )
+
+    def save(self, path: str) -> None:
+        np.savez(
+            os.path.join(path, LEXICAL_FILE),
+            terms=self.terms,
+            offsets=self.offsets,
+            doc_ids=self.doc_ids,
+            term_freqs=self.term_freqs,
+            doc_lengths=self.doc_lengths
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        with np.load(os.path.join(path, LEXICAL_FILE)) as data:
+            return cls(
+                data["terms"], data["offsets"], data["doc_ids"],
+                data["term_freqs"], data["doc_lengths"]
+            )
+
+    def search(self, query: str, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the ids and BM25 scores of the top_k matching chunks, best first."""
+        term_ids = [self.vocab[t] for t in dict.fromkeys(tokenize(query)) if t in self.vocab]
+        if not term_ids or top_k <= 0:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+
+        scores = np.zeros(len(self.doc_lengths), dtype="float32")
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end].astype("float32")
+            # Each document appears once per term, so plain fancy-index addition is safe
+            scores[docs] += self.idf[t] * tf * (BM25_K1 + 1) / (tf + self.length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > top_k:
+            matched = matched[np.argpartition(-scores[matched], top_k - 1)[:top_k]]
+        order = matched[np.argsort(-scores[matched], kind="stable")]
+        return order.astype("int64"), scores[order]
+
+
+def load_lexical_index(path: str) -> Optional[LexicalIndex]:
+    """Loads the lexical index of a vector store, or None for stores built without one."""
+    if not os.path.exists(os.path.join(path, LEXICAL_FILE)):
+        return None
+    try:
+        return LexicalIndex.load(path)
+    except Exception as e:
+        print(f"⚠️ Could not load lexical index at {path}: {e}")
+        return None
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """
+    Fuses several rankings of document ids into one.
+
+    Each document scores sum(1 / (k + rank)) over the rankings it appears in.
+    Returns (doc_id, score) pairs, best first.
+    """
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            doc_id = int(doc_id)
+            if doc_id < 0:
+                continue
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
@@ -0,0 +1,30 @@
+from typing import Any, Dict
+
+
+def get_performance_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Collects the runtime statistics of the retrieval pipeline in this process.
+
+    Returns:
+        Dictionary of section name to its statistics
+    """
+    from core.compute_scheduler import get_scheduler_stats
+    from core.diversity import get_diversity_stats
+    from core.embeddings import get_embedding_service_stats, get_model_stats
+    from core.image_store import get_image_stats
+    from core.query_cache import get_query_cache_stats
+    from core.reranker import get_reranker_stats
+    from core.vector_cache import get_cache_stats
+    from core.warmup import get_warmup_stats
+
+    return {
+        "Embedding model": get_model_stats(),
+        "Embedding service": get_embedding_service_stats(),
+        "Vector store cache": get_cache_stats(),
+        "Page images": get_image_stats(),
+        "Query embedding cache": get_query_cache_stats(),
+        "Re-ranker": get_reranker_stats(),
+        "Redundancy control": get_diversity_stats(),
+        "Compute scheduler": get_scheduler_stats(),
+        "Startup warm-up": get_warmup_stats()
+    }
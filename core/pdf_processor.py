@@ -1,146 +1,471 @@
 from pypdf import PdfReader
 import fitz  # PyMuPDF
 import base64
+import contextlib
+import hashlib
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Any, Tuple
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from io import BytesIO
 from PIL import Image
 
+# Engine that parses PDFs: "pymupdf" (fastest) or "pypdf" (pure Python);
+# either one opens each document once for both text and images
+PDF_PARSER_BACKEND = os.getenv("PDF_PARSER_BACKEND", "pymupdf")
+
+PARSER_BACKENDS = ("pymupdf", "pypdf")
+
+# Worker processes for page extraction; each opens the file itself and handles
+# a contiguous page range (1 keeps everything in the calling process)
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(max(1, (os.cpu_count() or 1) // 2))))
+
+# Smaller documents are parsed serially; starting workers costs more than it saves
+PDF_PARALLEL_MIN_PAGES = int(os.getenv("PDF_PARALLEL_MIN_PAGES", "200"))
+
+# Page ranges per worker; several smaller ranges even out pages of uneven cost
+PDF_RANGES_PER_WORKER = 4
+
+# Largest page range; a finished range is held in memory until it is consumed
+PDF_MAX_RANGE_PAGES = 50
+
 def clean_text(text: str) -> str:
     """Cleans null bytes and extra whitespace from text."""
     text = text.replace("\x00", " ")
     text = re.sub(r"\s+", " ", text)
     return text.strip()
 
-def extract_images_from_pdf(pdf_path: str, max_images_per_page: int = 3) -> Dict[int, List[str]]:
+def page_hash(text: str) -> str:
+    """Content hash of a page's cleaned text; unchanged pages keep their hash across revisions."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _iter_pymupdf_pages(
+    pdf_path: str,
+    extract_text: bool,
+    load_images: bool,
+    max_images_per_page: int,
+    start: int,
+    stop: Optional[int]
+) -> Iterator[Dict[str, Any]]:
+    try:
+        doc = fitz.open(pdf_path)
+    except Exception as e:
+        raise Exception(f"Failed to read PDF: {str(e)}")
+
+    try:
+        if start == 0:
+            print(f"📖 PDF has {len(doc)} pages")
+        for page_num in range(start + 1, min(len(doc), stop if stop is not None else len(doc)) + 1):
+            page = doc[page_num - 1]
+            text: Optional[str] = None
+            if extract_text:
+                try:
+                    text = page.get_text()
+                except Exception as e:
+                    print(f"⚠️  Page {page_num}: Could not extract text - {e}")
+
+            image_list = page.get_images()
+            refs = [{"xref": img[0], "width": img[2], "height": img[3]} for img in image_list[:max_images_per_page]]
+            images: List[bytes] = []
+            for img_index, ref in enumerate(refs if load_images else []):
+                try:
+                    images.append(doc.extract_image(ref["xref"])["image"])
+                except Exception as e:
+                    print(f"  ❌ Error extracting image {img_index}: {e}")
+
+            yield {"page": page_num, "text": text, "image_count": len(image_list), "image_refs": refs, "images": images}
+    finally:
+        doc.close()
+
+def _iter_pypdf_pages(
+    pdf_path: str,
+    extract_text: bool,
+    load_images: bool,
+    max_images_per_page: int,
+    start: int,
+    stop: Optional[int]
+) -> Iterator[Dict[str, Any]]:
+    try:
+        reader = PdfReader(pdf_path)
+        if start == 0:
+            print(f"📖 PDF has {len(reader.pages)} pages")
+    except Exception as e:
+        raise Exception(f"Failed to read PDF: {str(e)}")
+
+    for page_num, page in enumerate(reader.pages[start:stop], start=start + 1):
+        text: Optional[str] = None
+        if extract_text:
+            try:
+                text = page.extract_text()
+            except Exception as e:
+                print(f"⚠️  Page {page_num}: Could not extract text - {e}")
+
+        images: List[bytes] = []
+        refs: List[Dict[str, Any]] = []
+        try:
+            image_list = page.images
+            # A name-indexed virtual list at runtime, typed as a plain list
+            names = list(image_list.keys())  # type: ignore[attr-defined]
+            image_count = len(names)
+            # pypdf only learns image sizes by decoding them
+            refs = [{"name": name, "width": None, "height": None} for name in names[:max_images_per_page]]
+            for img_index, ref in enumerate(refs if load_images else []):
+                try:
+                    images.append(image_list[ref["name"]].data)
+                except Exception as e:
+                    print(f"  ❌ Error extracting image {img_index}: {e}")
+        except Exception as e:
+            print(f"  ❌ Error listing images: {e}")
+            image_count = 0
+
+        yield {"page": page_num, "text": text, "image_count": image_count, "image_refs": refs, "images": images}
+
+def iter_pdf_pages(
+    pdf_path: str,
+    backend: Optional[str] = None,
+    extract_text: bool = True,
+    max_images_per_page: int = 3,
+    start: int = 0,
+    stop: Optional[int] = None,
+    load_images: bool = True
+) -> Iterator[Dict[str, Any]]:
+    """
+    Opens a PDF once and yields its pages in order.
+
+    Each page is a dict with "page" (1-based number), "text" (raw extracted
+    text, or None if extraction failed or was skipped), "image_count",
+    "image_refs" (xref or name and size of at most max_images_per_page
+    embedded images) and "images" (their raw bytes, empty unless load_images).
+    start/stop select 0-based page indices like a slice.
+    """
+    backend = backend or PDF_PARSER_BACKEND
+    if backend == "pymupdf":
+        return _iter_pymupdf_pages(pdf_path, extract_text, load_images, max_images_per_page, start, stop)
+    if backend == "pypdf":
+        return _iter_pypdf_pages(pdf_path, extract_text, load_images, max_images_per_page, start, stop)
+    raise ValueError(f"Unknown PDF parser backend: {backend}")
+
+def to_jpeg(image_bytes: bytes) -> Optional[bytes]:
+    """
+    Resizes an embedded image and returns it as JPEG bytes.
+
+    Returns None for images too small to be useful (likely icons/logos).
+    """
+    # Skip very small images (likely icons/logos)
+    if len(image_bytes) < 1000:
+        print(f"  ⏭️  Skipping small image ({len(image_bytes)} bytes)")
+        return None
+    
+    # Convert to PIL Image
+    pil_image = Image.open(BytesIO(image_bytes))
+    
+    # Skip tiny dimensions
+    if pil_image.width < 50 or pil_image.height < 50:
+        print(f"  ⏭️  Skipping tiny image ({pil_image.width}x{pil_image.height})")
+        return None
+    
+    # Resize large images
+    max_size = 1024
+    if pil_image.width > max_size or pil_image.height > max_size:
+        pil_image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+        print(f"  📐 Resized to: {pil_image.width}x{pil_image.height}")
+    
+    # Convert to JPEG
+    buffer = BytesIO()
+    pil_image.convert('RGB').save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue()
+
+def encode_image(image_bytes: bytes) -> Optional[str]:
+    """Resizes an embedded image and returns it as base64 JPEG (None if it is skipped)."""
+    jpeg = to_jpeg(image_bytes)
+    return base64.b64encode(jpeg).decode() if jpeg is not None else None
+
+def _encode_page_images(page: Dict[str, Any], raw: bool = False) -> List[Any]:
+    """Base64 JPEGs of a page's images, or the JPEG bytes themselves with raw."""
+    print(f"📄 Page {page['page']}: Found {page['image_count']} images")
+    encode = to_jpeg if raw else encode_image
+    encoded: List[Any] = []
+    for img_index, image_bytes in enumerate(page["images"]):
+        try:
+            image = encode(image_bytes)
+        except Exception as e:
+            print(f"  ❌ Error extracting image {img_index}: {e}")
+            continue
+        if image is not None:
+            encoded.append(image)
+            print(f"  ✅ Extracted image {img_index + 1}")
+    return encoded
+
+def _page_image_refs(page: Dict[str, Any]) -> List[Dict[str, Any]]:
+    print(f"📄 Page {page['page']}: Found {page['image_count']} images")
+    refs: List[Dict[str, Any]] = []
+    for ref in page["image_refs"]:
+        # Same size filter as encode_image, where the size is known without decoding
+        if ref["width"] is not None and (ref["width"] < 50 or ref["height"] < 50):
+            print(f"  ⏭️  Skipping tiny image ({ref['width']}x{ref['height']})")
+            continue
+        refs.append(ref)
+    return refs
+
+def extract_page_images(pdf_path: str, page_num: int, refs: List[Dict[str, Any]]) -> List[bytes]:
+    """
+    Materializes recorded image references of one page as JPEG bytes.
+
+    References with an xref are read with PyMuPDF, named ones with pypdf;
+    images that encode_image would skip are left out.
+    """
+    raw: List[bytes] = []
+    if any("xref" in ref for ref in refs):
+        with fitz.open(pdf_path) as doc:
+            raw.extend(doc.extract_image(ref["xref"])["image"] for ref in refs if "xref" in ref)
+    named = [ref for ref in refs if "name" in ref]
+    if named:
+        image_list = PdfReader(pdf_path).pages[page_num - 1].images
+        raw.extend(image_list[ref["name"]].data for ref in named)
+
+    jpegs: List[bytes] = []
+    for image_bytes in raw:
+        try:
+            jpeg = to_jpeg(image_bytes)
+        except Exception as e:
+            print(f"  ❌ Error extracting image on page {page_num}: {e}")
+            continue
+        if jpeg is not None:
+            jpegs.append(jpeg)
+    return jpegs
+
+def extract_images_from_pdf(pdf_path: str, max_images_per_page: int = 3, backend: Optional[str] = None) -> Dict[int, List[str]]:
     """
     Extracts images from PDF and returns them as base64 strings organized by page.
     """
     print(f"🔍 Starting image extraction from: {pdf_path}")
     
     try:
-        doc = fitz.open(pdf_path)
         page_images = {}
-        total_images_found = 0
-        
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            image_list = page.get_images()
-            
-            print(f"📄 Page {page_num + 1}: Found {len(image_list)} images")
-            
-            page_images[page_num + 1] = []
-            
-            for img_index, img in enumerate(image_list[:max_images_per_page]):
-                try:
-                    xref = img[0]
-                    base_image = doc.extract_image(xref)
-                    image_bytes = base_image["image"]
-                    
-                    # Skip very small images (likely icons/logos)
-                    if len(image_bytes) < 1000:
-                        print(f"  ⏭️  Skipping small image ({len(image_bytes)} bytes)")
-                        continue
-                    
-                    # Convert to PIL Image
-                    pil_image = Image.open(BytesIO(image_bytes))
-                    
-                    # Skip tiny dimensions
-                    if pil_image.width < 50 or pil_image.height < 50:
-                        print(f"  ⏭️  Skipping tiny image ({pil_image.width}x{pil_image.height})")
-                        continue
-                    
-                    # Resize large images
-                    max_size = 1024
-                    if pil_image.width > max_size or pil_image.height > max_size:
-                        pil_image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
-                        print(f"  📐 Resized to: {pil_image.width}x{pil_image.height}")
-                    
-                    # Convert to JPEG and base64
-                    buffer = BytesIO()
-                    pil_image.convert('RGB').save(buffer, format='JPEG', quality=85)
-                    image_base64 = base64.b64encode(buffer.getvalue()).decode()
-                    
-                    page_images[page_num + 1].append(image_base64)
-                    total_images_found += 1
-                    print(f"  ✅ Extracted image {img_index + 1}")
-                    
-                except Exception as e:
-                    print(f"  ❌ Error extracting image {img_index}: {e}")
-                    continue
+        for page in iter_pdf_pages(pdf_path, backend, extract_text=False, max_images_per_page=max_images_per_page):
+            page_images[page["page"]] = _encode_page_images(page)
         
-        doc.close()
-        print(f"✅ Total images extracted: {total_images_found}")
+        print(f"✅ Total images extracted: {sum(len(images) for images in page_images.values())}")
         return page_images
         
     except Exception as e:
         print(f"❌ Error in image extraction: {e}")
         return {}
 
-def process_pdf(pdf_path: str, chunk_size: int = 1000, overlap: int = 200) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+def chunk_page(
+    text: Optional[str],
+    page_num: int,
+    num_images: int,
+    chunk_size: int = 1000,
+    overlap: int = 200
+) -> List[Dict[str, Any]]:
     """
-    Reads a PDF and returns text chunks with page numbers AND extracted images.
+    Splits the text of one page into overlapping chunks of whole sentences.
+
+    Pages with (almost) no text but with images get a single placeholder chunk.
     """
-    print(f"\n🚀 Processing PDF: {pdf_path}")
+    documents: List[Dict[str, Any]] = []
+
+    if not text or len(text.strip()) < 10:
+        # If no text but has images, add placeholder
+        if num_images:
+            placeholder = f"[Page {page_num} contains {num_images} image(s) but minimal text]"
+            documents.append({
+                "text": placeholder,
+                "page": page_num,
+                "has_images": True,
+                "page_hash": page_hash(placeholder)
+            })
+            print(f"📄 Page {page_num}: Images only")
+        return documents
+
+    text = clean_text(text)
+    text_hash = page_hash(text)
+    
+    # Split into sentences
+    sentences = re.split(r'(?<=[.!?])\s+', text)
     
-    # Extract images FIRST
-    page_images = extract_images_from_pdf(pdf_path)
+    current_chunk = ""
+    for sentence in sentences:
+        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
+            if len(current_chunk.strip()) >= 100:
+                documents.append({
+                    "text": current_chunk.strip(),
+                    "page": page_num,
+                    "has_images": num_images > 0,
+                    "page_hash": text_hash
+                })
+            # Start new chunk with overlap
+            words = current_chunk.split()
+            overlap_words = words[-int(overlap/5):] if len(words) > overlap/5 else words
+            current_chunk = " ".join(overlap_words) + " " + sentence + " "
+        else:
+            current_chunk += sentence + " "
     
-    # Extract text
+    # Add remaining text
+    if len(current_chunk.strip()) >= 100:
+        documents.append({
+            "text": current_chunk.strip(),
+            "page": page_num,
+            "has_images": num_images > 0,
+            "page_hash": text_hash
+        })
+
+    return documents
+
+def count_pages(pdf_path: str, backend: Optional[str] = None) -> int:
+    """Number of pages of a PDF (only the page tree is read)."""
+    backend = backend or PDF_PARSER_BACKEND
     try:
-        reader = PdfReader(pdf_path)
-        print(f"📖 PDF has {len(reader.pages)} pages")
+        if backend == "pypdf":
+            return len(PdfReader(pdf_path).pages)
+        with fitz.open(pdf_path) as doc:
+            return len(doc)
     except Exception as e:
         raise Exception(f"Failed to read PDF: {str(e)}")
-    
+
+def _iter_serial(
+    pdf_path: str,
+    backend: Optional[str],
+    start: int,
+    stop: Optional[int],
+    chunk_size: int,
+    overlap: int,
+    image_output: str = "base64"
+) -> Iterator[Tuple[int, List[Dict[str, Any]], List[Any]]]:
+    load_images = image_output != "refs"
+    for page in iter_pdf_pages(pdf_path, backend, start=start, stop=stop, load_images=load_images):
+        page_num = page["page"]
+        if load_images:
+            images = _encode_page_images(page, raw=image_output == "jpeg")
+        else:
+            images = _page_image_refs(page)
+        yield page_num, chunk_page(page["text"], page_num, len(images), chunk_size, overlap), images
+
+def _process_page_range(
+    pdf_path: str,
+    backend: Optional[str],
+    start: int,
+    stop: Optional[int],
+    chunk_size: int,
+    overlap: int,
+    image_output: str = "base64"
+) -> Tuple[List[Dict[str, Any]], Dict[int, List[Any]]]:
+    """Chunks and images (or image references) of pages start..stop-1; runs in a worker process."""
     documents: List[Dict[str, Any]] = []
+    page_images: Dict[int, List[Any]] = {}
+
+    for page_num, chunks, images in _iter_serial(pdf_path, backend, start, stop, chunk_size, overlap, image_output):
+        documents.extend(chunks)
+        page_images[page_num] = images
+
+    return documents, page_images
 
-    for page_num, page in enumerate(reader.pages, start=1):
+def _process_page_range_quietly(*args: Any) -> Tuple[List[Dict[str, Any]], Dict[int, List[Any]]]:
+    # Per-page progress from several workers would interleave; the parent reports per range
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return _process_page_range(*args)
+
+def _iter_parallel(
+    pdf_path: str,
+    backend: Optional[str],
+    num_pages: int,
+    workers: int,
+    chunk_size: int,
+    overlap: int,
+    image_output: str
+) -> Iterator[Tuple[int, List[Dict[str, Any]], List[Any]]]:
+    step = max(1, min(PDF_MAX_RANGE_PAGES, -(-num_pages // (workers * PDF_RANGES_PER_WORKER))))
+    starts = list(range(0, num_pages, step))
+    print(f"⚙️  Extracting {num_pages} pages in {len(starts)} ranges across {workers} processes")
+
+    # "spawn" keeps workers free of the app's threads (torch, FAISS, Streamlit)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+        pending: "deque" = deque()
+        submitted = 0
+        while submitted < len(starts) or pending:
+            # At most two ranges per worker are in flight or waiting to be consumed
+            while submitted < len(starts) and len(pending) < workers * 2:
+                start = starts[submitted]
+                stop = min(start + step, num_pages)
+                pending.append((start, stop, pool.submit(
+                    _process_page_range_quietly, pdf_path, backend, start, stop, chunk_size, overlap, image_output
+                )))
+                submitted += 1
+
+            # Ranges are consumed in page order, so the output matches the serial path
+            start, stop, future = pending.popleft()
+            range_documents, range_images = future.result()
+            print(
+                f"📄 Pages {start + 1}-{stop}: {len(range_documents)} chunks, "
+                f"{sum(len(images) for images in range_images.values())} images"
+            )
+
+            by_page: Dict[int, List[Dict[str, Any]]] = {}
+            for d in range_documents:
+                by_page.setdefault(d["page"], []).append(d)
+            for page_num in sorted(range_images):
+                yield page_num, by_page.get(page_num, []), range_images[page_num]
+
+def iter_page_results(
+    pdf_path: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    backend: Optional[str] = None,
+    workers: Optional[int] = None,
+    image_output: str = "base64"
+) -> Iterator[Tuple[int, List[Dict[str, Any]], List[Any]]]:
+    """
+    Yields (page number, chunks, images) for every page, in page order.
+
+    image_output selects the third item: "base64" images, "jpeg" bytes, or
+    "refs", where images are not decoded at all and their references for
+    extract_page_images are yielded instead.
+
+    Documents of at least PDF_PARALLEL_MIN_PAGES pages are split into page
+    ranges across PDF_WORKERS (or workers) processes, with a bounded number
+    of ranges in flight; the output is identical to a serial run.
+    """
+    workers = PDF_WORKERS if workers is None else workers
+    num_pages = count_pages(pdf_path, backend) if workers > 1 else 0
+
+    next_page = 0
+    if workers > 1 and num_pages >= PDF_PARALLEL_MIN_PAGES:
         try:
-            text = page.extract_text()
+            for result in _iter_parallel(pdf_path, backend, num_pages, workers, chunk_size, overlap, image_output):
+                next_page = result[0]
+                yield result
+            return
         except Exception as e:
-            print(f"⚠️  Page {page_num}: Could not extract text - {e}")
-            continue
-            
-        if not text or len(text.strip()) < 10:
-            # If no text but has images, add placeholder
-            if page_num in page_images and page_images[page_num]:
-                documents.append({
-                    "text": f"[Page {page_num} contains {len(page_images[page_num])} image(s) but minimal text]",
-                    "page": page_num,
-                    "has_images": True
-                })
-                print(f"📄 Page {page_num}: Images only")
-            continue
+            print(f"⚠️  Parallel extraction failed ({e}), extracting the remaining pages serially")
 
-        text = clean_text(text)
-        
-        # Split into sentences
-        sentences = re.split(r'(?<=[.!?])\s+', text)
-        
-        current_chunk = ""
-        for sentence in sentences:
-            if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-                if len(current_chunk.strip()) >= 100:
-                    documents.append({
-                        "text": current_chunk.strip(),
-                        "page": page_num,
-                        "has_images": page_num in page_images and len(page_images[page_num]) > 0
-                    })
-                # Start new chunk with overlap
-                words = current_chunk.split()
-                overlap_words = words[-int(overlap/5):] if len(words) > overlap/5 else words
-                current_chunk = " ".join(overlap_words) + " " + sentence + " "
-            else:
-                current_chunk += sentence + " "
-        
-        # Add remaining text
-        if len(current_chunk.strip()) >= 100:
-            documents.append({
-                "text": current_chunk.strip(),
-                "page": page_num,
-                "has_images": page_num in page_images and len(page_images[page_num]) > 0
-            })
+    yield from _iter_serial(pdf_path, backend, next_page, None, chunk_size, overlap, image_output)
+
+def process_pdf(
+    pdf_path: str,
+    chunk_size: int = 1000,
+    overlap: int = 200,
+    backend: Optional[str] = None,
+    workers: Optional[int] = None
+) -> Tuple[List[Dict[str, Any]], Dict[int, List[str]]]:
+    """
+    Reads a PDF and returns text chunks with page numbers AND extracted images.
+
+    Text and images come from a single pass over the document with the
+    PDF_PARSER_BACKEND engine (or backend); large documents are extracted in
+    parallel (see iter_page_results).
+    """
+    print(f"\n🚀 Processing PDF: {pdf_path}")
+    
+    documents: List[Dict[str, Any]] = []
+    page_images: Dict[int, List[str]] = {}
+
+    for page_num, chunks, images in iter_page_results(pdf_path, chunk_size, overlap, backend, workers):
+        documents.extend(chunks)
+        page_images[page_num] = images
 
     if not documents:
         raise Exception("No text or images could be extracted from the PDF")
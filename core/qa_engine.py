@@ -1,29 +1,34 @@
-import os
-import pickle
-from typing import List, Dict, Any
-from core.embeddings import load_vector_store, similarity_search
+import time
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple
+from core.embeddings import encode_query, result_vectors, similarity_search
+from core.diversity import candidate_pool_size, select_diverse
+from core.vector_cache import get_vector_store
+from core.global_index import global_index
+from core.reranker import RERANK_CANDIDATES, RERANKER_ENABLED, rerank
 from core.llm import ask_llm_stream
 from core.entity_extractor import extract_entities
 
 def answer_question(
-    question: str, 
-    vector_store_path: str, 
+    question: str,
+    vector_store_path: str,
     top_k: int = 5
 ) -> Dict[str, Any]:
     """
     Coordinates the RAG process with vision support: loads index, searches, and queries the LLM.
-    
+
     Args:
         question: User's question
         vector_store_path: Path to the vector store
         top_k: Number of relevant chunks to retrieve
-    
+
     Returns:
-        Dictionary containing answer, sources, entities, and confidence
+        Dictionary containing answer, sources, entities, confidence and timings (ms)
     """
+    start = time.perf_counter()
     try:
-        # 1. Load the vector store
-        index, metadata = load_vector_store(vector_store_path)
+        # 1. Load the vector store (shared across sessions)
+        store = get_vector_store(vector_store_path)
+        index, metadata = store["index"], store["metadata"]
     except FileNotFoundError:
         return {
             "answer": "⚠️ Please upload and index a PDF first before asking questions.",
@@ -40,77 +45,203 @@ def answer_question(
         }
 
     try:
-        # 2. Search for relevant context
-        search_results = similarity_search(question, index, metadata, top_k=top_k)
-        
-        if not search_results:
-            return {
-                "answer": "I couldn't find any relevant information in the document to answer your question.",
-                "sources": [],
-                "entities": {},
-                "confidence": 0.0
-            }
-        
-        # 3. Combine text context
+        # 2. Search for relevant context (more candidates when they are re-ranked)
+        search_results = similarity_search(
+            question, index, metadata, top_k=_retrieval_k(top_k), lexical=store["lexical"]
+        )
+        search_results, timings = _rerank_results(question, search_results, candidate_pool_size(top_k), start)
+        # 3. Drop near-duplicate (overlapping) chunks
+        search_results, diversity = _select_diverse(
+            question, search_results, lambda results: result_vectors(index, results), top_k
+        )
+    except Exception as e:
+        return _error_result(e, [])
+
+    page_images = store["page_images"]
+    return _answer_from_results(
+        question, search_results, lambda res: page_images.get(res["page"], []), timings, start, diversity
+    )
+
+
+def answer_question_all(
+    question: str,
+    pdf_ids: Optional[Iterable[int]] = None,
+    top_k: int = 5
+) -> Dict[str, Any]:
+    """
+    Answers a question from the global cross-document index.
+
+    Args:
+        question: User's question
+        pdf_ids: PDFs to search (None searches every indexed PDF)
+        top_k: Number of relevant chunks to retrieve
+
+    Returns:
+        Dictionary containing answer, sources (with pdf_id), entities, confidence and timings (ms)
+    """
+    start = time.perf_counter()
+    try:
+        search_results = global_index.search(question, pdf_ids=pdf_ids, top_k=_retrieval_k(top_k))
+        search_results, timings = _rerank_results(question, search_results, candidate_pool_size(top_k), start)
+        search_results, diversity = _select_diverse(
+            question, search_results,
+            lambda results: global_index.chunk_vectors([res["chunk_id"] for res in results]),
+            top_k
+        )
+    except Exception as e:
+        return _error_result(e, [])
+
+    def page_images(res: Dict[str, Any]) -> List[str]:
+        vector_path = global_index.vector_path(res["pdf_id"])
+        if not vector_path:
+            return []
+        try:
+            return get_vector_store(vector_path)["page_images"].get(res["page"], [])
+        except Exception as e:
+            print(f"Error loading images: {e}")
+            return []
+
+    return _answer_from_results(question, search_results, page_images, timings, start, diversity)
+
+
+def _retrieval_k(top_k: int) -> int:
+    """Number of chunks to retrieve: a deeper candidate list when re-ranking or MMR is on."""
+    pool = candidate_pool_size(top_k)
+    return max(pool, RERANK_CANDIDATES) if RERANKER_ENABLED else pool
+
+
+def _rerank_results(
+    question: str,
+    search_results: List[Dict[str, Any]],
+    top_k: int,
+    start: float
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Applies the optional cross-encoder stage; returns the kept results and timings so far."""
+    timings: Dict[str, Any] = {"retrieval_ms": (time.perf_counter() - start) * 1000}
+    if not RERANKER_ENABLED or len(search_results) <= 1:
+        return search_results[:top_k], timings
+
+    try:
+        search_results, info = rerank(question, search_results, top_k)
+        timings.update(info)
+    except Exception as e:
+        # A missing or failing re-ranker must never block answering
+        print(f"⚠️ Re-ranking skipped: {e}")
+        search_results = search_results[:top_k]
+    return search_results, timings
+
+
+def _select_diverse(
+    question: str,
+    search_results: List[Dict[str, Any]],
+    get_vectors: Callable[[List[Dict[str, Any]]], Any],
+    top_k: int
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Applies redundancy control; returns the kept results and the prompt characters saved."""
+    try:
+        return select_diverse(encode_query(question), search_results, get_vectors(search_results), top_k)
+    except Exception as e:
+        print(f"⚠️ Redundancy control skipped: {e}")
+        return search_results[:top_k], {"removed": 0, "chars_saved": 0}
+
+
+def _collect_images(
+    search_results: List[Dict[str, Any]],
+    get_page_images: Callable[[Dict[str, Any]], List[str]],
+    max_images: int = 3
+) -> List[str]:
+    """Collects up to max_images images from the retrieved pages that contain images."""
+    images_to_send: List[str] = []
+    seen = set()
+
+    for res in search_results:
+        if not res.get("has_images", False):
+            continue
+        key = (res.get("pdf_id"), res["page"])
+        if key in seen:
+            continue
+        seen.add(key)
+
+        images_to_send.extend(get_page_images(res))
+        if len(images_to_send) >= max_images:
+            break
+
+    return images_to_send[:max_images]
+
+
+def _answer_from_results(
+    question: str,
+    search_results: List[Dict[str, Any]],
+    get_page_images: Callable[[Dict[str, Any]], List[str]],
+    timings: Optional[Dict[str, Any]] = None,
+    start: Optional[float] = None,
+    diversity: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """Builds the prompt from the retrieved chunks and queries the LLM."""
+    timings = dict(timings or {})
+    diversity = diversity or {"removed": 0, "chars_saved": 0}
+    if not search_results:
+        return {
+            "answer": "I couldn't find any relevant information in the document to answer your question.",
+            "sources": [],
+            "entities": {},
+            "confidence": 0.0,
+            "timings": timings,
+            "redundancy": diversity
+        }
+
+    try:
+        # 4. Combine text context
         context_text: str = "\n\n".join([
-            f"[Page {res['page']}]: {res['text']}" 
+            f"[Page {res['page']}]: {res['text']}"
             for res in search_results
         ])
-        
-        # 4. Load images from relevant pages
-        relevant_pages = list(set([res['page'] for res in search_results if res.get('has_images', False)]))
-        
-        images_to_send = []
-        if relevant_pages:
-            # Load stored images
-            images_path = os.path.join(vector_store_path, "images.pkl")
-            if os.path.exists(images_path):
-                try:
-                    with open(images_path, "rb") as f:
-                        page_images = pickle.load(f)
-                    
-                    # Collect images from relevant pages (max 3 images total)
-                    for page_num in relevant_pages:
-                        if page_num in page_images:
-                            images_to_send.extend(page_images[page_num])
-                            if len(images_to_send) >= 3:
-                                break
-                    
-                    images_to_send = images_to_send[:3]  # Limit to 3 images
-                except Exception as e:
-                    print(f"Error loading images: {e}")
-        
-        # 5. Get response from LLM (with vision if images available)
+
+        # 5. Load images from relevant pages (max 3 images total)
+        images_to_send = _collect_images(search_results, get_page_images)
+
+        # 6. Get response from LLM (with vision if images available)
+        llm_start = time.perf_counter()
         full_answer: List[str] = []
         for chunk in ask_llm_stream(context_text, question, images=images_to_send if images_to_send else None):
             full_answer.append(chunk)
-        
+
         final_answer: str = "".join(full_answer).strip()
-        
+        timings["llm_ms"] = (time.perf_counter() - llm_start) * 1000
+
         # Handle empty responses
         if not final_answer:
             final_answer = "I couldn't generate a proper response. Please try rephrasing your question."
 
-        # 6. Extract entities for metadata
+        # 7. Extract entities for metadata
         entities = extract_entities(final_answer)
 
-        # 7. Calculate confidence based on distance scores
+        # 8. Calculate confidence based on distance scores
         avg_distance = sum(r["distance"] for r in search_results) / len(search_results)
         confidence = max(0.0, min(1.0, 1.0 - (avg_distance / 10.0)))
 
+        if start is not None:
+            timings["total_ms"] = (time.perf_counter() - start) * 1000
+
         return {
             "answer": final_answer,
             "sources": search_results,
             "entities": entities,
             "confidence": confidence,
-            "used_vision": len(images_to_send) > 0 if images_to_send else False
+            "used_vision": len(images_to_send) > 0,
+            "timings": timings,
+            "redundancy": diversity
         }
-        
+
     except Exception as e:
-        return {
-            "answer": f"⚠️ Error generating answer: {str(e)}",
-            "sources": search_results if 'search_results' in locals() else [],
-            "entities": {},
-            "confidence": 0.0,
-            "used_vision": False
-        }
\ No newline at end of file
+        return _error_result(e, search_results)
+
+
+def _error_result(error: Exception, search_results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        "answer": f"⚠️ Error generating answer: {str(error)}",
+        "sources": search_results,
+        "entities": {},
+        "confidence": 0.0,
+        "used_vision": False
+    }
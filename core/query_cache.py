@@ -0,0 +1,201 @@
+import os
+import re
+import sqlite3
+import threading
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+# Number of query embeddings kept in memory (0 disables the cache)
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", "2048"))
+
+# Optional SQLite file that keeps query embeddings across restarts
+QUERY_CACHE_PATH = os.getenv("QUERY_CACHE_PATH", "")
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive key for a query."""
+    return re.sub(r"\s+", " ", query).strip().lower()
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe LRU cache of normalized query -> embedding vector.
+
+    When a persistence path is given, embeddings are also written to a small
+    SQLite table and looked up there on in-memory misses.
+    """
+
+    def __init__(self, max_size: int, persist_path: Optional[str] = None, namespace: str = ""):
+        self.max_size = max_size
+        self.persist_path = persist_path or None
+        # Scopes persisted entries to one embedding model/backend
+        self.namespace = namespace
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if self.persist_path:
+            try:
+                os.makedirs(os.path.dirname(self.persist_path) or ".", exist_ok=True)
+                conn = sqlite3.connect(self.persist_path)
+                conn.execute("""
+                    CREATE TABLE IF NOT EXISTS query_embeddings (
+                        query TEXT PRIMARY KEY,
+                        dim INTEGER NOT NULL,
+                        embedding BLOB NOT NULL
+                    )
+                """)
+                conn.commit()
+                conn.close()
+            except (OSError, sqlite3.Error) as e:
+                print(f"[QUERY CACHE ERROR] Persistence disabled: {e}")
+                self.persist_path = None
+
+    def get_or_compute(self, query: str, encode: Callable[[str], np.ndarray]) -> np.ndarray:
+        """Returns the cached embedding of query, computing and storing it on a miss."""
+        if self.max_size <= 0:
+            return encode(query)
+
+        key = normalize_query(query)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return vector
+
+        vector = self._read_disk(key)
+        if vector is not None:
+            with self._lock:
+                self.disk_hits += 1
+                self._put(key, vector)
+            return vector
+
+        vector = encode(query)
+        vector.setflags(write=False)  # Shared between callers
+        with self._lock:
+            self.misses += 1
+            self._put(key, vector)
+        self._write_disk(key, vector)
+        return vector
+
+    def get_or_compute_batch(
+        self,
+        queries: List[str],
+        encode_batch: Callable[[List[str]], np.ndarray]
+    ) -> np.ndarray:
+        """
+        Returns the embeddings of several queries as one (n, dim) matrix.
+
+        Cached queries are looked up; all misses are encoded in a single batch.
+        """
+        if self.max_size <= 0:
+            return encode_batch(queries)
+
+        keys = [normalize_query(q) for q in queries]
+        # First query text seen for each key; misses encode the text, not the key
+        texts = dict(zip(reversed(keys), reversed(queries)))
+        vectors: Dict[str, np.ndarray] = {}
+
+        with self._lock:
+            for key in keys:
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    vectors[key] = vector
+
+        missing = [key for key in dict.fromkeys(keys) if key not in vectors]
+        for key in list(missing):
+            vector = self._read_disk(key)
+            if vector is not None:
+                vectors[key] = vector
+                missing.remove(key)
+                with self._lock:
+                    self.disk_hits += 1
+                    self._put(key, vector)
+
+        if missing:
+            encoded = encode_batch([texts[key] for key in missing])
+            with self._lock:
+                self.misses += len(missing)
+                for key, row in zip(missing, encoded):
+                    vector = row[None, :].copy()
+                    vector.setflags(write=False)
+                    vectors[key] = vector
+                    self._put(key, vector)
+            for key in missing:
+                self._write_disk(key, vectors[key])
+
+        return np.vstack([vectors[key] for key in keys]).astype("float32")
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit-rate metrics of the cache."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_size": self.max_size,
+                "persistent": bool(self.persist_path)
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _put(self, key: str, vector: np.ndarray) -> None:
+        self._entries[key] = vector
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def _disk_key(self, key: str) -> str:
+        return f"{self.namespace}\x00{key}" if self.namespace else key
+
+    def _read_disk(self, key: str) -> Optional[np.ndarray]:
+        if not self.persist_path:
+            return None
+        try:
+            conn = sqlite3.connect(self.persist_path)
+            row = conn.execute(
+                "SELECT dim, embedding FROM query_embeddings WHERE query = ?", (self._disk_key(key),)
+            ).fetchone()
+            conn.close()
+        except sqlite3.Error as e:
+            print(f"[QUERY CACHE ERROR] {e}")
+            return None
+        if row is None:
+            return None
+        return np.frombuffer(row[1], dtype="float32").reshape(-1, row[0])
+
+    def _write_disk(self, key: str, vector: np.ndarray) -> None:
+        if not self.persist_path:
+            return
+        try:
+            conn = sqlite3.connect(self.persist_path)
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (query, dim, embedding) VALUES (?, ?, ?)",
+                (self._disk_key(key), int(vector.shape[-1]), vector.astype("float32").tobytes())
+            )
+            conn.commit()
+            conn.close()
+        except sqlite3.Error as e:
+            # Caching must never break a search
+            print(f"[QUERY CACHE ERROR] {e}")
+
+
+# Process-wide cache shared by all Streamlit sessions
+query_cache = QueryEmbeddingCache(QUERY_CACHE_SIZE, QUERY_CACHE_PATH)
+
+
+def get_query_cache_stats() -> Dict[str, Any]:
+    """Returns statistics of the shared query embedding cache."""
+    return query_cache.stats()
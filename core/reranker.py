@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, List, Tuple
+
+# Optional cross-encoder stage between retrieval and prompt construction
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "0") == "1"
+RERANKER_MODEL = os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+# Candidates retrieved for re-ranking, and pairs scored per forward pass
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+
+# Hard per-query budget; candidates not scored in time keep their retrieval order
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "300"))
+
+_reranker: Any = None
+_reranker_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "enabled": RERANKER_ENABLED,
+    "model": RERANKER_MODEL,
+    "queries": 0,
+    "over_budget": 0,
+    "pairs_scored": 0,
+    "total_ms": 0.0
+}
+
+
+def get_reranker() -> Any:
+    """Returns the shared CrossEncoder, loading it on first call."""
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                start = time.perf_counter()
+                _reranker = CrossEncoder(RERANKER_MODEL)
+                print(f"✅ Re-ranker '{RERANKER_MODEL}' ready in {time.perf_counter() - start:.2f}s")
+    return _reranker
+
+
+def rerank(
+    query: str,
+    candidates: List[Dict[str, Any]],
+    top_k: int,
+    budget_ms: float = RERANK_BUDGET_MS,
+    batch_size: int = RERANK_BATCH_SIZE
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Re-orders retrieval candidates by cross-encoder score and keeps the best top_k.
+
+    Candidates are scored in batches, in retrieval order. A batch is only
+    started if it is expected to finish within the budget; candidates left
+    unscored keep their retrieval order after the scored ones.
+
+    Returns:
+        The top_k results (with "rerank_score" where scored) and timing info
+    """
+    # The budget covers scoring only; a first call loading the model must still score
+    model = get_reranker()
+    start = time.perf_counter()
+    deadline = start + budget_ms / 1000.0
+
+    scores: List[float] = []
+    last_batch_s = 0.0
+    while len(scores) < len(candidates):
+        now = time.perf_counter()
+        if now + last_batch_s > deadline:
+            break
+        batch = candidates[len(scores):len(scores) + batch_size]
+        scores.extend(float(s) for s in np.ravel(model.predict([(query, res["text"]) for res in batch])))
+        last_batch_s = time.perf_counter() - now
+
+    scored = [dict(res, rerank_score=score) for res, score in zip(candidates, scores)]
+    scored.sort(key=lambda res: -res["rerank_score"])
+    ranked = (scored + candidates[len(scores):])[:top_k]
+
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    over_budget = len(scores) < len(candidates)
+    with _stats_lock:
+        _stats["queries"] += 1
+        _stats["over_budget"] += int(over_budget)
+        _stats["pairs_scored"] += len(scores)
+        _stats["total_ms"] += elapsed_ms
+
+    return ranked, {
+        "rerank_ms": elapsed_ms,
+        "candidates": len(candidates),
+        "scored": len(scores),
+        "over_budget": over_budget
+    }
+
+
+def get_reranker_stats() -> Dict[str, Any]:
+    """Returns how often re-ranking ran, how long it took and how often it ran out of budget."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["avg_ms"] = stats["total_ms"] / stats["queries"] if stats["queries"] else 0.0
+    stats["loaded"] = _reranker is not None
+    return stats
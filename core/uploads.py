@@ -0,0 +1,40 @@
+import hashlib
+import os
+from typing import BinaryIO, Tuple
+
+# Bytes copied per read while an upload is written to disk
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+
+def save_upload(source: BinaryIO, path: str) -> Tuple[str, int]:
+    """
+    Streams an uploaded file to path while hashing it.
+
+    The file is written under a temporary name and renamed when complete, so
+    a failed upload never leaves a partial PDF behind.
+
+    Returns:
+        The SHA-256 hex digest of the content and its size in bytes
+    """
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{path}.part"
+
+    if hasattr(source, "seek"):
+        source.seek(0)
+    try:
+        with open(tmp_path, "wb") as f:
+            while True:
+                block = source.read(UPLOAD_CHUNK_BYTES)
+                if not block:
+                    break
+                digest.update(block)
+                f.write(block)
+                size += len(block)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return digest.hexdigest(), size
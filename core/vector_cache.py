@@ -0,0 +1,202 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from core.embeddings import METADATA_FILES, load_vector_store, read_index_config
+from core.image_store import IMAGE_INDEX_FILE, IMAGE_REFS_FILE, IMAGES_FILE, load_page_images
+from core.lexical_index import LEXICAL_FILE, load_lexical_index
+
+# Memory budget for loaded vector stores (approximated by their on-disk size)
+VECTOR_CACHE_MAX_MB = float(os.getenv("VECTOR_CACHE_MAX_MB", "1024"))
+
+# Files whose modification time identifies a generation of a vector store
+STORE_FILES = (
+    "index_config.json", "index.faiss", "metadata.pkl", IMAGES_FILE, IMAGE_INDEX_FILE, IMAGE_REFS_FILE,
+    "vectors.npy", LEXICAL_FILE,
+    *METADATA_FILES.values()
+)
+
+# Files that "mmap" stores map from the page cache instead of private memory
+MAPPED_FILES = ("index.faiss", "vectors.npy", *METADATA_FILES.values())
+
+# Re-rank vectors and columnar metadata are mapped in every storage mode
+ALWAYS_MAPPED_FILES = ("vectors.npy", *METADATA_FILES.values())
+
+
+def _store_signature(path: str) -> Tuple[Tuple[str, int, int], ...]:
+    """Returns (filename, mtime_ns, size) for each store file that exists."""
+    signature = []
+    for name in STORE_FILES:
+        file_path = os.path.join(path, name)
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
+            continue
+        signature.append((name, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _charged_size(path: str, signature: Tuple[Tuple[str, int, int], ...]) -> int:
+    """Bytes a store is charged against the budget (its on-disk size minus mapped files)."""
+    # Mapped files live in the shared page cache and are not charged to the budget
+    mapped = MAPPED_FILES if read_index_config(path).get("storage") == "mmap" else ALWAYS_MAPPED_FILES
+    return sum(size for name, _, size in signature if name not in mapped)
+
+
+def estimate_store_size(path: str) -> int:
+    """Bytes a store would be charged in the cache if it were loaded now."""
+    key = os.path.abspath(path)
+    return _charged_size(key, _store_signature(key))
+
+
+class VectorStoreCache:
+    """
+    Thread-safe LRU cache of loaded vector stores keyed by their directory.
+
+    Entries are reloaded when any store file changes on disk and the least
+    recently used entries are evicted once the memory budget is exceeded.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Per-store load lock and the number of threads using it; dropped once
+        # no load of that store is in flight, so it never outlives the load
+        self._load_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.evictions = 0
+
+    def get(self, path: str) -> Dict[str, Any]:
+        """
+        Returns the cached store for path, loading it from disk on a miss.
+
+        The returned dict holds "index", "metadata", "lexical" (None for stores
+        built before hybrid retrieval) and "page_images".
+        """
+        key = os.path.abspath(path)
+        signature = _store_signature(key)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["signature"] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            load_lock, users = self._load_locks.get(key, (threading.Lock(), 0))
+            self._load_locks[key] = (load_lock, users + 1)
+
+        # Only one thread loads a given store; the others wait and re-check
+        try:
+            return self._load_once(key, signature, load_lock)
+        finally:
+            with self._lock:
+                load_lock, users = self._load_locks[key]
+                if users > 1:
+                    self._load_locks[key] = (load_lock, users - 1)
+                else:
+                    del self._load_locks[key]
+
+    def _load_once(self, key: str, signature: Tuple[Tuple[str, int, int], ...], load_lock: threading.Lock) -> Dict[str, Any]:
+        with load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry["signature"] == signature:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                self.misses += 1
+                if entry is not None:
+                    self.reloads += 1
+
+            entry = self._load(key, signature)
+
+            with self._lock:
+                self._remove(key)
+                self._entries[key] = entry
+                self._bytes += entry["size"]
+                self._evict()
+
+        return entry
+
+    def contains(self, path: str) -> bool:
+        """True if the current generation of the store at path is loaded."""
+        key = os.path.abspath(path)
+        signature = _store_signature(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry is not None and entry["signature"] == signature
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """Drops one store (or every store when path is None) from the cache."""
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._remove(os.path.abspath(path))
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters and current memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "reloads": self.reloads,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._entries),
+                "size_mb": self._bytes / 1024 / 1024,
+                "max_mb": self.max_bytes / 1024 / 1024
+            }
+
+    def _load(self, key: str, signature: Tuple[Tuple[str, int, int], ...]) -> Dict[str, Any]:
+        index, metadata = load_vector_store(key)
+
+        page_images: Mapping[int, List[str]] = {}
+        try:
+            page_images = load_page_images(key)
+        except Exception as e:
+            print(f"Error loading images: {e}")
+
+        size = _charged_size(key, signature)
+
+        return {
+            "index": index,
+            "metadata": metadata,
+            "lexical": load_lexical_index(key),
+            "page_images": page_images,
+            "signature": signature,
+            "size": size
+        }
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry["size"]
+
+    def _evict(self) -> None:
+        # Always keep the most recently used entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry["size"]
+            self.evictions += 1
+
+
+# Process-wide cache shared by all Streamlit sessions
+vector_store_cache = VectorStoreCache(int(VECTOR_CACHE_MAX_MB * 1024 * 1024))
+
+
+def get_vector_store(path: str) -> Dict[str, Any]:
+    """Returns the loaded vector store at path from the shared cache."""
+    return vector_store_cache.get(path)
+
+
+def get_cache_stats() -> Dict[str, Any]:
+    """Returns statistics of the shared vector store cache."""
+    return vector_store_cache.stats()
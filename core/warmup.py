@@ -0,0 +1,138 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+# Number of most-queried PDFs whose vector stores are preloaded at startup (0 disables)
+WARMUP_TOP_PDFS = int(os.getenv("WARMUP_TOP_PDFS", "5"))
+
+# Memory budget for preloaded stores; kept below the cache budget so warm-up
+# never evicts what live sessions load
+WARMUP_MEMORY_MB = float(os.getenv("WARMUP_MEMORY_MB", "512"))
+
+# Also load the embedding model (see core.embeddings.warm_up_model)
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "1") == "1"
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Any] = {
+    "state": "idle",
+    "model_seconds": None,
+    "reranker_seconds": None,
+    "stores_loaded": 0,
+    "stores_skipped": 0,
+    "stores_mb": 0.0,
+    "total_seconds": None
+}
+
+
+def _update_stats(**values: Any) -> None:
+    with _stats_lock:
+        _stats.update(values)
+
+
+def warm_up(top_n: int = WARMUP_TOP_PDFS, memory_mb: float = WARMUP_MEMORY_MB, load_model: bool = EMBEDDING_WARMUP) -> Dict[str, Any]:
+    """
+    Preloads the embedding model, the re-ranker (when RERANKER_ENABLED) and the
+    vector stores of the most-queried PDFs.
+
+    Stores are taken in order of chat_history question counts and skipped when
+    they would push the preloaded total over memory_mb (or the cache budget).
+
+    Returns:
+        The warm-up statistics
+    """
+    # Imported here so starting the thread does not pay for FAISS/torch imports
+    from core.database import get_top_queried_pdfs
+    from core.embeddings import warm_up_model
+    from core.reranker import RERANKER_ENABLED, get_reranker
+    from core.vector_cache import estimate_store_size, get_vector_store, vector_store_cache
+
+    start = time.perf_counter()
+    _update_stats(state="running")
+
+    if load_model:
+        model_start = time.perf_counter()
+        warm_up_model()
+        _update_stats(model_seconds=time.perf_counter() - model_start)
+
+    if RERANKER_ENABLED:
+        reranker_start = time.perf_counter()
+        try:
+            get_reranker()
+            _update_stats(reranker_seconds=time.perf_counter() - reranker_start)
+        except Exception as e:
+            print(f"⚠️ Warm-up could not load the re-ranker: {e}")
+
+    budget = min(memory_mb * 1024 * 1024, vector_store_cache.max_bytes)
+    used = 0
+    loaded = skipped = 0
+
+    try:
+        hot_pdfs = get_top_queried_pdfs(top_n) if top_n > 0 else []
+    except Exception as e:
+        print(f"⚠️ Warm-up could not read query counts: {e}")
+        hot_pdfs = []
+
+    for pdf in hot_pdfs:
+        path = pdf["vector_path"]
+        if not os.path.isdir(path):
+            continue
+        try:
+            if vector_store_cache.contains(path):
+                continue
+            size = estimate_store_size(path)
+            if used + size > budget:
+                skipped += 1
+                continue
+            get_vector_store(path)
+            used += size
+            loaded += 1
+        except Exception as e:
+            print(f"⚠️ Warm-up could not load PDF {pdf['id']}: {e}")
+            skipped += 1
+
+    total = time.perf_counter() - start
+    _update_stats(
+        state="done",
+        stores_loaded=loaded,
+        stores_skipped=skipped,
+        stores_mb=used / 1024 / 1024,
+        total_seconds=total
+    )
+    print(
+        f"🔥 Warm-up done in {total:.2f}s: {loaded} hot vector store(s) "
+        f"({used / 1024 / 1024:.1f} MB), {skipped} skipped for budget or errors"
+    )
+    return get_warmup_stats()
+
+
+def start_warmup(background: bool = True) -> Optional[threading.Thread]:
+    """
+    Runs warm_up, by default in a daemon thread that is returned.
+
+    Returns None without starting anything when EMBEDDING_WARMUP is off and
+    WARMUP_TOP_PDFS is 0.
+    """
+    if not EMBEDDING_WARMUP and WARMUP_TOP_PDFS <= 0:
+        return None
+
+    def _run() -> None:
+        try:
+            warm_up()
+        except Exception as e:
+            _update_stats(state="failed")
+            print(f"⚠️ Warm-up failed: {e}")
+
+    if not background:
+        _run()
+        return None
+
+    thread = threading.Thread(target=_run, name="startup-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def get_warmup_stats() -> Dict[str, Any]:
+    """Returns what the startup warm-up loaded and how long it took."""
+    with _stats_lock:
+        return dict(_stats)
@@ -1,6 +1,5 @@
 import streamlit as st
 import os
-import pickle
 import pandas as pd
 from datetime import datetime
 import sys
@@ -12,10 +11,11 @@ try:
     from core.auth import require_auth, check_authentication
     from core.database import (
         create_user, get_all_users, update_user, delete_user,
-        add_pdf, get_all_pdfs, delete_pdf, get_chat_history
+        add_pdf, replace_pdf, find_pdf_by_hash, get_all_pdfs, delete_pdf, get_chat_history
     )
-    from core.pdf_processor import process_pdf
-    from core.embeddings import create_vector_store
+    from core.uploads import save_upload
+    from core.ingest_pipeline import ingest_pdf
+    from core.global_index import add_pdf_to_global_index
 except ImportError as e:
     st.error(f"Error importing modules: {e}")
     st.stop()
@@ -172,6 +172,19 @@ with tab1:
                     **Size:** {file_size_mb:.2f} MB
                 """)
                 
+                # A new revision of an existing PDF re-embeds only its changed pages
+                try:
+                    existing_pdfs = get_all_pdfs() if user['role'] == 'superadmin' else get_all_pdfs(uploaded_by=user['id'])
+                except Exception:
+                    existing_pdfs = []
+                replace_options = [None] + existing_pdfs
+                replaced_pdf = st.selectbox(
+                    "Replace an existing PDF (new revision)",
+                    options=replace_options,
+                    format_func=lambda p: "— New document —" if p is None else f"{p['original_name']} (ID {p['id']})",
+                    help="Unchanged pages reuse their existing vectors; chat history is kept"
+                )
+                
                 if st.button("🚀 Upload and Index", type="primary", use_container_width=True):
                     try:
                         with st.spinner("📄 Processing PDF..."):
@@ -184,61 +197,116 @@ with tab1:
                             safe_filename = f"{timestamp}_{uploaded_file.name.replace(' ', '_')}"
                             pdf_path = f"data/uploads/{safe_filename}"
                             
-                            with open(pdf_path, "wb") as f:
-                                f.write(uploaded_file.getbuffer())
-                            
-                            # Process PDF
-                            try:
-                                docs, page_images = process_pdf(pdf_path)
-                            except Exception as proc_error:
-                                st.error(f"❌ PDF processing failed: {proc_error}")
-                                st.stop()
+                            # Hash while streaming to disk
+                            content_hash, file_size = save_upload(uploaded_file, pdf_path)
                             
-                            if not docs:
-                                st.error("❌ No text could be extracted from this PDF")
-                            else:
-                                # Create vector store
-                                vector_path = f"data/vectorstore/{safe_filename.replace('.pdf', '')}"
-                                with st.spinner(f"⚡ Indexing {len(docs)} chunks..."):
-                                    create_vector_store(docs, vector_path)
-                                
-                                # Save images if available
-                                total_images = 0
-                                if page_images:
-                                    images_dir = os.path.join(vector_path, "images")
-                                    os.makedirs(images_dir, exist_ok=True)
-                                    images_path = os.path.join(vector_path, "images.pkl")
-                                    try:
-                                        with open(images_path, "wb") as f:
-                                            pickle.dump(page_images, f)
-                                        total_images = sum(len(imgs) for imgs in page_images.values())
-                                    except Exception as img_error:
-                                        st.warning(f"⚠️ Could not save images: {img_error}")
-                                
-                                # Add to database
+                            # Identical bytes already indexed: share the existing vector store
+                            existing_pdf = find_pdf_by_hash(content_hash)
+                            if existing_pdf and os.path.isdir(existing_pdf['vector_path']):
+                                os.remove(pdf_path)
+                                shared = dict(
+                                    filename=existing_pdf['filename'],
+                                    file_size=file_size,
+                                    num_pages=existing_pdf['num_pages'],
+                                    num_chunks=existing_pdf['num_chunks'],
+                                    num_images=existing_pdf['num_images'],
+                                    content_hash=content_hash,
+                                    vector_path=existing_pdf['vector_path']
+                                )
                                 try:
-                                    pdf_id = add_pdf(
-                                        filename=safe_filename,
-                                        original_name=uploaded_file.name,
-                                        uploaded_by=user['id'],
-                                        file_size=uploaded_file.size,
-                                        num_pages=len(set(d['page'] for d in docs if 'page' in d)),
-                                        num_chunks=len(docs),
-                                        num_images=total_images
-                                    )
+                                    if replaced_pdf:
+                                        pdf_id = replaced_pdf['id']
+                                        replace_pdf(pdf_id, **shared)
+                                    else:
+                                        pdf_id = add_pdf(original_name=uploaded_file.name, uploaded_by=user['id'], **shared)
+                                    
+                                    try:
+                                        add_pdf_to_global_index(pdf_id, existing_pdf['vector_path'])
+                                    except Exception as index_error:
+                                        st.warning(f"⚠️ Could not add PDF to the global index: {index_error}")
                                     
                                     st.success(f"""
-                                        ✅ **PDF Uploaded Successfully!**
+                                        ⚡ **Already indexed - reused existing index**
+                                        
+                                        Same content as **{existing_pdf['original_name']}** (ID {existing_pdf['id']}).
                                         
-                                        - 📄 **Chunks:** {len(docs)}
-                                        - 🖼️ **Images:** {total_images}
-                                        - 📊 **Pages:** {len(set(d['page'] for d in docs if 'page' in d))}
+                                        - 📄 **Chunks:** {existing_pdf['num_chunks']}
                                         - 🆔 **PDF ID:** {pdf_id}
                                     """)
-                                    
-                                    st.balloons()
                                 except Exception as db_error:
                                     st.error(f"❌ Database error: {db_error}")
+                            else:
+                                # Parse, embed and index the PDF as a stream (bounded memory)
+                                vector_path = f"data/vectorstore/{safe_filename.replace('.pdf', '')}"
+                                previous_path = replaced_pdf['vector_path'] if replaced_pdf else None
+                                if previous_path and not os.path.exists(previous_path):
+                                    previous_path = None
+                                try:
+                                    with st.spinner("⚡ Extracting and indexing pages..."):
+                                        _, docs, ingest_report = ingest_pdf(pdf_path, vector_path, previous_path=previous_path)
+                                except Exception as proc_error:
+                                    st.error(f"❌ PDF processing failed: {proc_error}")
+                                    st.stop()
+                            
+                                if not docs:
+                                    st.error("❌ No text could be extracted from this PDF")
+                                else:
+                                    reindex_report = ingest_report if previous_path else None
+                                    total_images = ingest_report["images"]
+                                
+                                    # Add to database
+                                    try:
+                                        if replaced_pdf:
+                                            pdf_id = replaced_pdf['id']
+                                            replace_pdf(
+                                                pdf_id,
+                                                filename=safe_filename,
+                                                file_size=file_size,
+                                                num_pages=len(set(d['page'] for d in docs if 'page' in d)),
+                                                num_chunks=len(docs),
+                                                num_images=total_images,
+                                                content_hash=content_hash,
+                                                vector_path=vector_path
+                                            )
+                                        else:
+                                            pdf_id = add_pdf(
+                                                filename=safe_filename,
+                                                original_name=uploaded_file.name,
+                                                uploaded_by=user['id'],
+                                                file_size=file_size,
+                                                num_pages=len(set(d['page'] for d in docs if 'page' in d)),
+                                                num_chunks=len(docs),
+                                                num_images=total_images,
+                                                content_hash=content_hash,
+                                                vector_path=vector_path
+                                            )
+                                    
+                                        # Make the PDF searchable from "all documents"
+                                        try:
+                                            add_pdf_to_global_index(pdf_id, vector_path)
+                                        except Exception as index_error:
+                                            st.warning(f"⚠️ Could not add PDF to the global index: {index_error}")
+                                    
+                                        st.success(f"""
+                                            ✅ **PDF Uploaded Successfully!**
+                                        
+                                            - 📄 **Chunks:** {len(docs)}
+                                            - 🖼️ **Images:** {total_images}
+                                            - 📊 **Pages:** {len(set(d['page'] for d in docs if 'page' in d))}
+                                            - 🆔 **PDF ID:** {pdf_id}
+                                        """)
+                                    
+                                        if reindex_report:
+                                            st.info(
+                                                f"♻️ Reused {reindex_report['reused_chunks']}/{reindex_report['chunks']} chunks "
+                                                f"({reindex_report['reused_pages']} unchanged pages, "
+                                                f"{reindex_report['changed_pages']} changed or new); "
+                                                f"saved ~{reindex_report['seconds_saved']:.1f}s of embedding"
+                                            )
+                                    
+                                        st.balloons()
+                                    except Exception as db_error:
+                                        st.error(f"❌ Database error: {db_error}")
                     
                     except Exception as e:
                         st.error(f"❌ Upload failed: {str(e)}")
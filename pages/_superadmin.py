@@ -16,6 +16,7 @@ try:
         get_all_users, get_all_pdfs, get_chat_history,
         create_user, delete_user, update_user, delete_pdf
     )
+    from core.metrics import get_performance_stats
 except ImportError as e:
     st.error(f"Error importing modules: {e}")
     st.stop()
@@ -353,6 +354,19 @@ with tab1:
             st.info("No activity yet")
     except Exception as e:
         st.info(f"Could not load recent activity: {str(e)[:50]}...")
+    
+    st.markdown("---")
+    st.markdown("#### ⚡ Performance")
+    
+    try:
+        perf_stats = get_performance_stats()
+        perf_cols = st.columns(len(perf_stats))
+        for perf_col, (section, stats) in zip(perf_cols, perf_stats.items()):
+            with perf_col:
+                st.markdown(f"**{section}**")
+                st.json(stats, expanded=False)
+    except Exception as e:
+        st.info(f"Could not load performance stats: {str(e)[:50]}...")
 
 # ==================== TAB 2: ALL USERS ====================
 with tab2:
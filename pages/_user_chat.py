@@ -10,7 +10,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 try:
     from core.auth import check_authentication
     from core.database import get_all_pdfs, log_chat
-    from core.qa_engine import answer_question
+    from core.qa_engine import answer_question, answer_question_all
+    from core.global_index import ensure_pdfs_indexed
 except ImportError as e:
     st.error(f"Error importing modules: {e}")
     st.stop()
@@ -158,6 +159,13 @@ def require_auth():
 # Check authentication
 user = require_auth()
 
+def get_vector_path(pdf: Dict[str, Any]) -> str:
+    """Vector store directory of an uploaded PDF (shared by uploads of identical files)"""
+    if pdf.get('vector_path'):
+        return pdf['vector_path']
+    filename = pdf.get('filename', '').replace('.pdf', '')
+    return f"data/vectorstore/{filename}"
+
 # ------------------------------------
 # Session State Initialization
 # ------------------------------------
@@ -261,6 +269,17 @@ with st.sidebar:
     
     st.divider()
     
+    # Cross-document search
+    search_all = False
+    if pdfs:
+        search_all = st.toggle(
+            "🔎 Search all documents",
+            key="search_all_docs",
+            help="Answer from every available PDF instead of only the selected one"
+        )
+    
+    st.divider()
+    
     # Clear chat button
     if st.button("🗑️ Clear Chat", use_container_width=True, key="clear_chat_btn"):
         st.session_state.chat_messages = []
@@ -358,7 +377,8 @@ for msg in st.session_state.chat_messages:
         if role == "assistant" and msg.get("sources"):
             with st.expander("📚 View Sources"):
                 for idx, src in enumerate(msg["sources"], 1):
-                    st.markdown(f"**Source {idx}** • Page {src.get('page', 'N/A')}")
+                    source_label = f" • {src['pdf_name']}" if src.get("pdf_name") else ""
+                    st.markdown(f"**Source {idx}**{source_label} • Page {src.get('page', 'N/A')}")
                     if src.get("text"):
                         st.caption(src["text"][:300] + "..." if len(src["text"]) > 300 else src["text"])
                     if src.get("has_images"):
@@ -384,11 +404,10 @@ if prompt := st.chat_input(f"Ask a question about {selected_pdf.get('original_na
         
         try:
             # Get vector store path
-            filename = selected_pdf.get('filename', '').replace('.pdf', '')
-            vector_path = f"data/vectorstore/{filename}"
+            vector_path = get_vector_path(selected_pdf)
             
             # Check if vector store exists
-            if not os.path.exists(vector_path):
+            if not search_all and not os.path.exists(vector_path):
                 error_msg = f"⚠️ Error: Vector store not found for this PDF. Path: {vector_path}"
                 message_placeholder.markdown(error_msg)
                 st.session_state.chat_messages.append({
@@ -399,11 +418,23 @@ if prompt := st.chat_input(f"Ask a question about {selected_pdf.get('original_na
                 st.stop()
             
             # Get answer from QA engine
-            with st.spinner("Analyzing document..."):
-                result: Dict[str, Any] = answer_question(
-                    question=prompt,
-                    vector_store_path=vector_path
-                )
+            if search_all:
+                pdf_names = {pdf["id"]: pdf.get('original_name', 'Unknown') for pdf in pdfs}
+                with st.spinner("Searching all documents..."):
+                    # PDFs uploaded before the global index existed are added on first use
+                    ensure_pdfs_indexed({pdf["id"]: get_vector_path(pdf) for pdf in pdfs})
+                    result: Dict[str, Any] = answer_question_all(
+                        question=prompt,
+                        pdf_ids=list(pdf_names)
+                    )
+                for src in result.get("sources", []):
+                    src["pdf_name"] = pdf_names.get(src.get("pdf_id"), "Unknown")
+            else:
+                with st.spinner("Analyzing document..."):
+                    result = answer_question(
+                        question=prompt,
+                        vector_store_path=vector_path
+                    )
             
             answer = result.get("answer", "I couldn't find an answer in the document.")
             sources = result.get("sources", [])
@@ -428,7 +459,8 @@ if prompt := st.chat_input(f"Ask a question about {selected_pdf.get('original_na
             if sources:
                 with st.expander("📚 View Sources"):
                     for idx, src in enumerate(sources, 1):
-                        st.markdown(f"**Source {idx}** • Page {src.get('page', 'N/A')}")
+                        source_label = f" • {src['pdf_name']}" if src.get("pdf_name") else ""
+                        st.markdown(f"**Source {idx}**{source_label} • Page {src.get('page', 'N/A')}")
                         if src.get("text"):
                             st.caption(src["text"][:300] + "..." if len(src["text"]) > 300 else src["text"])
                         if src.get("has_images"):
@@ -440,7 +472,7 @@ if prompt := st.chat_input(f"Ask a question about {selected_pdf.get('original_na
             try:
                 log_chat(
                     user_id=user["id"],
-                    pdf_id=st.session_state.selected_pdf_id,
+                    pdf_id=None if search_all else st.session_state.selected_pdf_id,
                     question=prompt,
                     answer=full_response[:500]  # Limit for logging
                 )